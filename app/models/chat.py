@@ -1,5 +1,6 @@
-from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from pydantic import BaseModel, Field, field_validator
+from typing import Optional, List, Dict, Any, Deque
+from collections import deque
 from datetime import datetime
 
 class ChatRequest(BaseModel):
@@ -17,9 +18,20 @@ class ChatResponse(BaseModel):
     timestamp: datetime
     confidence_score: Optional[float] = None
 
+# Max messages kept per session; older ones are dropped
+MAX_SESSION_MESSAGES = 64
+
 class ChatSession(BaseModel):
     session_id: str
     persona: str
-    messages: List[Dict[str, Any]] = []
+    messages: Deque[Dict[str, Any]] = Field(default_factory=lambda: deque(maxlen=MAX_SESSION_MESSAGES))
     context: Dict[str, Any] = {}
-    created_at: datetime
\ No newline at end of file
+    created_at: datetime
+
+    @field_validator("messages", mode="after")
+    @classmethod
+    def _bound_messages(cls, messages: Deque[Dict[str, Any]]) -> Deque[Dict[str, Any]]:
+        """Keep explicitly passed histories bounded too (only the newest MAX_SESSION_MESSAGES)"""
+        if messages.maxlen == MAX_SESSION_MESSAGES:
+            return messages
+        return deque(messages, maxlen=MAX_SESSION_MESSAGES)
@@ -1,15 +1,17 @@
 # app/routes/chat.py - Complete implementation with all endpoints
 
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from datetime import datetime
 from typing import Dict, List, Optional
 import uuid
 import logging
+import orjson
 from pydantic import BaseModel, Field
 
 from app.models.personas import PersonaType, PersonaConfig
-from app.services.rag_agent_service import rag_agent
-from app.services.supabase_service import db_service
+from app.services.rag_agent_service import get_rag_agent
+from app.services.supabase_service import SupabaseService, get_db_service
 from app.services.auth_service import get_current_user  # We'll create this
 
 router = APIRouter()
@@ -54,7 +56,7 @@ class ChatHistoryResponse(BaseModel):
 
 # Main chat endpoint
 @router.post("/chat/", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest):
+async def chat_endpoint(request: ChatRequest, db_service: SupabaseService = Depends(get_db_service)):
     """
     Main chat endpoint that processes user messages and returns structured responses.
     """
@@ -69,7 +71,7 @@ async def chat_endpoint(request: ChatRequest):
         persona = user_params.get("persona", "general")
         
         # Process message with RAG agent
-        ai_result = await rag_agent.process_message(
+        ai_result = await get_rag_agent().process_message(
             message=request.message,
             persona=persona,
             session_id=request.chat_ID,
@@ -98,9 +100,48 @@ async def chat_endpoint(request: ChatRequest):
         logger.error(f"Chat endpoint error: {e}")
         raise HTTPException(status_code=500, detail=f"Chat processing failed: {str(e)}")
 
+# Streaming chat endpoint
+@router.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest, db_service: SupabaseService = Depends(get_db_service)):
+    """
+    Same as /chat/ but streams newline-delimited JSON: {"type": "token", "content": ...}
+    lines while the answer is generated, then one {"type": "final", ...} line with the
+    structured response (same fields as ChatResponse).
+    """
+    try:
+        user_id = await db_service.get_user_id_from_chat(request.chat_ID)
+        user_params = await db_service.get_user_params(user_id)
+        persona = user_params.get("persona", "general")
+    except Exception as e:
+        logger.error(f"Chat stream endpoint error: {e}")
+        raise HTTPException(status_code=500, detail=f"Chat processing failed: {str(e)}")
+    
+    async def events():
+        async for event in get_rag_agent().stream_message(
+            message=request.message,
+            persona=persona,
+            session_id=request.chat_ID,
+            user_params=user_params
+        ):
+            if event["type"] == "final":
+                structured_response = _parse_ai_response(event["response"])
+                try:
+                    await db_service.save_chat_message(
+                        chat_id=request.chat_ID,
+                        user_id=user_id,
+                        message=request.message,
+                        response=structured_response
+                    )
+                except Exception as e:
+                    logger.error(f"Error saving streamed chat message: {e}")
+                event = {"type": "final", "chat_ID": request.chat_ID, **structured_response}
+            yield orjson.dumps(event) + b"\n"
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
 # NEW ENDPOINT: Get chat history
 @router.get("/get_chat_history/{chat_ID}", response_model=ChatHistoryResponse)
-async def get_chat_history(chat_ID: str):
+async def get_chat_history(chat_ID: str, db_service: SupabaseService = Depends(get_db_service)):
     """
     Retrieve complete chat history for a given chat ID.
     """
@@ -159,7 +200,7 @@ class UserParams(BaseModel):
     persona: Optional[str] = "general"
 
 @router.post("/save_user_info/")
-async def save_user_info(user_params: UserParams, uid: str):
+async def save_user_info(user_params: UserParams, uid: str, db_service: SupabaseService = Depends(get_db_service)):
     """Save user parameters to database"""
     try:
         await db_service.save_user_params(uid, user_params.dict(exclude_none=True))
@@ -169,7 +210,7 @@ async def save_user_info(user_params: UserParams, uid: str):
         raise HTTPException(status_code=500, detail=f"Failed to save user parameters: {str(e)}")
 
 @router.get("/get_user_info/")
-async def get_user_info(uid: str) -> UserParams:
+async def get_user_info(uid: str, db_service: SupabaseService = Depends(get_db_service)) -> UserParams:
     """Retrieve user parameters from database"""
     try:
         params = await db_service.get_user_params(uid)
@@ -187,7 +228,7 @@ class ChatSummary(BaseModel):
     chat_ts: str  # YYYY-MM-DD format
 
 @router.get("/get_chats/")
-async def get_chats(uid: str, ts_start: str) -> List[ChatSummary]:
+async def get_chats(uid: str, ts_start: str, db_service: SupabaseService = Depends(get_db_service)) -> List[ChatSummary]:
     """Retrieve previous chats for the given user"""
     try:
         # Validate date format
@@ -4,6 +4,7 @@ Prevents hallucinations by grounding responses in authoritative sources
 """
 
 import os
+import asyncio
 import logging
 from typing import List, Dict, Optional, Tuple
 import numpy as np
@@ -12,6 +13,8 @@ from sklearn.metrics.pairwise import cosine_similarity
 from dataclasses import dataclass
 import json
 
+from app.utils.embedding_cache import embed_with_cache
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -133,23 +136,17 @@ Website: https://www.dbo.siemens.com/""",
             self.document_chunks.append(chunk)
             
     async def _create_document_embeddings(self):
-        """Create embeddings for all document chunks"""
-        embeddings = []
-        
-        for chunk in self.document_chunks:
-            try:
-                response = self.client.embeddings.create(
-                    model=self.embedding_model,
-                    input=chunk.content
-                )
-                chunk.embedding = response.data[0].embedding
-                embeddings.append(chunk.embedding)
-            except Exception as e:
-                logger.error(f"Error creating embedding: {e}")
-                embeddings.append(np.zeros(1536))  # Default embedding dimension
+        """Create embeddings for all document chunks (batched requests, off the event loop)"""
+        texts = [chunk.content for chunk in self.document_chunks]
+        embeddings = await asyncio.to_thread(embed_with_cache, self.client, self.embedding_model, texts)
+        
+        for chunk, embedding in zip(self.document_chunks, embeddings):
+            if len(embedding) == 0:
+                embedding = np.zeros(1536, dtype=np.float32)  # Default embedding dimension
+            chunk.embedding = embedding
                 
         # Create embeddings matrix for efficient search
-        self.embeddings_matrix = np.array(embeddings)
+        self.embeddings_matrix = np.stack([chunk.embedding for chunk in self.document_chunks]) if self.document_chunks else None
         
     async def semantic_search(self, query: str, top_k: int = 3) -> List[Dict]:
         """Perform semantic search on official documents"""
@@ -1,6 +1,7 @@
 # app/services/supabase_service.py - Supabase implementation
 
 import os
+from functools import lru_cache
 from typing import Dict, List, Optional
 from datetime import datetime, timedelta
 import logging
@@ -331,5 +332,14 @@ class SupabaseService:
         
         return channel
 
-# Create global instance
-db_service = SupabaseService()
+# Global instance, built on first use so importing this module doesn't create the client
+@lru_cache(maxsize=1)
+def get_db_service() -> SupabaseService:
+    """Return the shared SupabaseService, creating it on the first call"""
+    return SupabaseService()
+
+def __getattr__(name):
+    # Keeps `from app.services.supabase_service import db_service` working
+    if name == "db_service":
+        return get_db_service()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,206 @@
+"""
+Persistent embedding cache: sqlite table keyed by sha256(model + "\0" + text)
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Max inputs per embeddings request, shared by every caller (the API accepts up to
+# 2048; smaller requests fail and retry cheaply when rate limited)
+EMBEDDING_BATCH_SIZE = 256
+
+# sqlite's default limit on bound parameters per statement is 999
+_SELECT_CHUNK = 900
+
+
+def embedding_key(model: str, text: str) -> str:
+    """Cache key for one (model, text) pair"""
+    return hashlib.sha256(f"{model}\0{text}".encode()).hexdigest()
+
+
+class EmbeddingCache:
+    """Stores float32 embeddings on disk so restarts don't re-embed unchanged text"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, dim INTEGER, vec BLOB)"
+        )
+        self._conn.commit()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Return {key: vector} for the keys that are cached"""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), _SELECT_CHUNK):
+                chunk = keys[start:start + _SELECT_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vec FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put(self, key: str, vector) -> None:
+        self.put_many({key: vector})
+
+    def put_many(self, vectors: Dict[str, object]) -> None:
+        """Store vectors (lists or arrays); existing keys are left untouched"""
+        rows = []
+        for key, vector in vectors.items():
+            vec = np.asarray(vector, dtype=np.float32)
+            if vec.size:
+                rows.append((key, vec.shape[0], vec.tobytes()))
+        if not rows:
+            return
+
+        with self._lock:
+            self._conn.executemany("INSERT OR IGNORE INTO embeddings (key, dim, vec) VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> Dict:
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hit_rate}
+
+
+class LRUEmbeddingCache:
+    """Thread-safe in-memory LRU of text -> embedding, for hot query embeddings"""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.sha256(text.encode()).digest()
+
+    def get(self, text: str):
+        key = self._key(text)
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+
+    def put(self, text: str, embedding) -> None:
+        key = self._key(text)
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def warmup(self, texts: List[str], embed_many: Callable[[List[str]], List]) -> None:
+        """Pre-populate with frequent queries, embedding all of them in one call"""
+        for text, embedding in zip(texts, embed_many(texts)):
+            if len(embedding) > 0:
+                self.put(text, embedding)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+
+@lru_cache(maxsize=1)
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Shared cache at EMBEDDING_CACHE_PATH (None if the file can't be opened)"""
+    path = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite3")
+    try:
+        return EmbeddingCache(path)
+    except sqlite3.Error as e:
+        logger.warning(f"Embedding cache disabled, could not open {path}: {e}")
+        return None
+
+
+def embed_with_cache(client, model: str, texts: List[str], batch_size: int = EMBEDDING_BATCH_SIZE,
+                     normalize: bool = False) -> List[np.ndarray]:
+    """
+    Embed texts, serving repeats from the persistent cache and sending only misses
+    to OpenAI (batch_size inputs per request, each distinct text once). Embeddings come back as float32
+    arrays (unit length with normalize=True); failed inputs as empty arrays.
+    """
+    cache = get_embedding_cache()
+    keys = [embedding_key(model, text) for text in texts]
+    cached = {}
+    if cache:
+        try:
+            cached = cache.get_many(keys)
+        except Exception as e:
+            logger.warning(f"Embedding cache read failed, embedding all inputs: {e}")
+
+    empty = np.zeros(0, dtype=np.float32)
+    embeddings = [cached.get(key, empty) for key in keys]
+    # First position of each distinct uncached text; repeats share its embedding
+    first_index = {}
+    for i, key in enumerate(keys):
+        if key not in cached:
+            first_index.setdefault(key, i)
+    missing = list(first_index.values())
+
+    embed_fn = client.embeddings.create
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start:start + batch_size]
+        try:
+            response = embed_fn(model=model, input=[texts[i] for i in batch])
+            for item in response.data:
+                embeddings[batch[item.index]] = np.asarray(item.embedding, dtype=np.float32)
+        except Exception as e:
+            logger.error(f"Embedding error: {e}")
+
+    if len(missing) < len(keys) - len(cached):
+        for i, key in enumerate(keys):
+            if key in first_index:
+                embeddings[i] = embeddings[first_index[key]]
+
+    if cache and missing:
+        try:
+            cache.put_many({keys[i]: embeddings[i] for i in missing if len(embeddings[i]) > 0})
+        except Exception as e:
+            logger.warning(f"Embedding cache write failed, returning uncached embeddings: {e}")
+        if len(texts) > 1:
+            logger.info(f"Embedding cache: {len(texts) - len(missing)}/{len(texts)} hits, overall hit rate {cache.hit_rate:.0%}")
+
+    if normalize:
+        # Cached raw; normalized copies so cosine similarity is a bare dot product
+        embeddings = [embedding / (np.linalg.norm(embedding) + 1e-12) if len(embedding) > 0 else embedding
+                      for embedding in embeddings]
+
+    return embeddings
@@ -0,0 +1,72 @@
+"""
+Keyword search: Okapi BM25 over a small corpus, and reciprocal rank fusion with vector rankings
+"""
+
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# Constant from the RRF paper: damps the weight of the very first ranks
+RRF_K = 60
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens"""
+    return _TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Okapi BM25 with postings lists: a query only touches the documents that
+    share one of its terms, so scoring a short query costs microseconds.
+    """
+
+    def __init__(self, texts: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        self._count = len(texts)
+        doc_tokens = [tokenize(text) for text in texts]
+        lengths = np.array([len(tokens) for tokens in doc_tokens], dtype=np.float32)
+        avg_length = float(lengths.mean()) if self._count else 0.0
+
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for doc, tokens in enumerate(doc_tokens):
+            for term, freq in Counter(tokens).items():
+                postings.setdefault(term, []).append((doc, freq))
+
+        # term -> (doc rows, precomputed BM25 weight of the term in each of them)
+        self._postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for term, entries in postings.items():
+            docs = np.array([doc for doc, _ in entries], dtype=np.intp)
+            freqs = np.array([freq for _, freq in entries], dtype=np.float32)
+            idf = math.log(1.0 + (self._count - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = k1 * (1.0 - b + b * lengths[docs] / avg_length)
+            self._postings[term] = (docs, idf * freqs * (k1 + 1.0) / (freqs + norm))
+
+    def __len__(self):
+        return self._count
+
+    def search(self, query: str, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (row indices, BM25 scores) of the k best matching rows, best first"""
+        scores = np.zeros(self._count, dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = self._postings.get(term)
+            if posting is not None:
+                scores[posting[0]] += posting[1]
+
+        matched = np.flatnonzero(scores)
+        best = matched[np.argsort(-scores[matched], kind="stable")][:k]
+        return best, scores[best]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = RRF_K) -> List[int]:
+    """Fuse best-first rankings of row indices by sum of 1 / (k + rank)"""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking, start=1):
+            row = int(row)
+            scores[row] = scores.get(row, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
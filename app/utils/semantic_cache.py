@@ -0,0 +1,147 @@
+"""
+Semantic cache: exact-key lookups plus cosine-similarity lookups on query embeddings
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+import numpy as np
+
+
+def normalize_vector(vector) -> np.ndarray:
+    """Return the vector as a unit-length float32 array (zero vectors unchanged)"""
+    vec = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm > 0 else vec
+
+
+class SemanticCache:
+    """
+    LRU cache with two levels:
+    1. exact match on a hashable key (literal repeats)
+    2. nearest cached query embedding with cosine similarity >= threshold
+
+    Query embeddings live in one preallocated (max_size, dim) float32 matrix so
+    the semantic lookup is a single matrix-vector product.
+    """
+
+    def __init__(self, max_size: int = 1024, similarity_threshold: float = 0.95, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.similarity_threshold = similarity_threshold
+        self.ttl = ttl
+
+        # key -> (slot, namespace, value, created_at); ordered oldest -> newest
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._slot_keys: List[Optional[Hashable]] = [None] * max_size
+        self._free_slots = list(range(max_size - 1, -1, -1))
+        self._vectors: Optional[np.ndarray] = None  # allocated on first put
+        self._created = np.full(max_size, np.inf)  # per-slot insert time; inf = free
+
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Exact-key lookup"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self._is_expired(entry):
+            self._remove(key)
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+
+    def get_similar(self, embedding, namespace: Hashable = None) -> Optional[Any]:
+        """Return the value cached for the most similar query embedding, if close enough"""
+        if self._vectors is None or not self._entries or embedding is None or len(embedding) == 0:
+            self.misses += 1
+            return None
+
+        query = normalize_vector(embedding)
+        similarities = self._vectors @ query  # free slots are zero rows -> similarity 0
+        candidates = np.flatnonzero(similarities >= self.similarity_threshold)
+
+        for slot in candidates[np.argsort(-similarities[candidates])]:
+            key = self._slot_keys[slot]
+            entry = self._entries.get(key)
+            if entry is None or entry[1] != namespace:
+                continue
+            if self._is_expired(entry):
+                self._remove(key)
+                continue
+
+            self._entries.move_to_end(key)
+            self.semantic_hits += 1
+            return entry[2]
+
+        self.misses += 1
+        return None
+
+    def put(self, key: Hashable, embedding, value: Any, namespace: Hashable = None):
+        """Insert or replace an entry, evicting expired entries and then the least recently used one if full"""
+        self.expire()
+        if key in self._entries:
+            self._remove(key)
+        if not self._free_slots:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+
+        slot = self._free_slots.pop()
+        if embedding is not None and len(embedding) > 0:
+            vector = normalize_vector(embedding)
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_size, vector.shape[0]), dtype=np.float32)
+            self._vectors[slot] = vector
+
+        created_at = time.monotonic()
+        self._slot_keys[slot] = key
+        self._created[slot] = created_at
+        self._entries[key] = (slot, namespace, value, created_at)
+
+    def expire(self) -> int:
+        """Drop every entry older than ttl (one vectorized scan); returns how many were dropped"""
+        if self.ttl is None or not self._entries:
+            return 0
+        expired_slots = np.flatnonzero(self._created <= time.monotonic() - self.ttl)
+        for slot in expired_slots:
+            self._remove(self._slot_keys[slot])
+        return len(expired_slots)
+
+    def clear(self):
+        """Drop all entries"""
+        self._entries.clear()
+        self._slot_keys = [None] * self.max_size
+        self._free_slots = list(range(self.max_size - 1, -1, -1))
+        self._created.fill(np.inf)
+        if self._vectors is not None:
+            self._vectors.fill(0.0)
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for monitoring"""
+        lookups = self.hits + self.semantic_hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'exact_hits': self.hits,
+            'semantic_hits': self.semantic_hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits + self.semantic_hits) / lookups if lookups else 0.0
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _is_expired(self, entry: tuple) -> bool:
+        return self.ttl is not None and (time.monotonic() - entry[3]) >= self.ttl
+
+    def _remove(self, key: Hashable):
+        slot = self._entries.pop(key)[0]
+        if self._vectors is not None:
+            self._vectors[slot] = 0.0
+        self._slot_keys[slot] = None
+        self._created[slot] = np.inf
+        self._free_slots.append(slot)
@@ -0,0 +1,76 @@
+"""
+Vectorized cosine search: L2-normalized float32 matrices and top-k selection
+"""
+
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+# Approximate nearest neighbour index for larger corpora
+try:
+    import hnswlib
+    HNSWLIB_AVAILABLE = True
+except ImportError:
+    HNSWLIB_AVAILABLE = False
+
+# Below this many vectors a brute-force matmul is as fast as an HNSW lookup
+HNSW_MIN_ITEMS = 256
+
+
+def build_normalized_matrix(embeddings: Sequence[Sequence[float]]) -> np.ndarray:
+    """Stack embeddings into an (N, D) float32 matrix with unit-length rows"""
+    if len(embeddings) == 0:
+        return np.zeros((0, 0), dtype=np.float32)
+
+    matrix = np.array(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+def top_k_indices(similarities: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest similarities, best first (argpartition + small sort)"""
+    if k <= 0 or similarities.shape[0] == 0:
+        return np.zeros(0, dtype=np.intp)
+    if k >= similarities.shape[0]:
+        return np.argsort(-similarities)
+
+    candidates = np.argpartition(-similarities, k)[:k]
+    return candidates[np.argsort(-similarities[candidates])]
+
+
+class CosineIndex:
+    """
+    Top-k cosine search over a normalized matrix: HNSW (hnswlib) once the corpus
+    has HNSW_MIN_ITEMS vectors and hnswlib is installed, matmul + argpartition otherwise.
+    """
+
+    def __init__(self, matrix: np.ndarray):
+        self.matrix = matrix
+        self._hnsw = None
+
+        count = matrix.shape[0]
+        if HNSWLIB_AVAILABLE and count >= HNSW_MIN_ITEMS:
+            index = hnswlib.Index(space='cosine', dim=matrix.shape[1])
+            index.init_index(max_elements=count, ef_construction=200, M=16)
+            index.add_items(matrix, np.arange(count))
+            index.set_ef(64)
+            self._hnsw = index
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (row indices, cosine similarities) of the k best rows, best first"""
+        k = min(k, len(self))
+        if k <= 0:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.float32)
+
+        if self._hnsw is not None:
+            labels, distances = self._hnsw.knn_query(query, k=k)
+            return labels[0].astype(np.intp), 1.0 - distances[0]
+
+        similarities = self.matrix @ query
+        indices = top_k_indices(similarities, k)
+        return indices, similarities[indices]
@@ -4,12 +4,62 @@ Document management system for handling multiple official documents
 
 import asyncio
 import logging
+import os
+import re
 from pathlib import Path
-from typing import Dict, List, Optional
+from types import MappingProxyType
+from typing import Awaitable, Callable, Dict, List, Optional
+import numpy as np
+import orjson
+from app.utils.semantic_cache import SemanticCache
 from .document_processor import AdvancedDocumentProcessor, SIEMENS_DOCUMENT_METADATA
 
+# For SIMD-accelerated similarity search
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+
+# HNSW graph when faiss is not installed
+try:
+    import hnswlib
+    HNSWLIB_AVAILABLE = True
+except ImportError:
+    HNSWLIB_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# Switch from exact to approximate (HNSW) search above this many chunks
+HNSW_MIN_CHUNKS = 100_000
+
+# Filename pattern -> document metadata, first match wins
+_METADATA_PATTERNS = [
+    (re.compile(r'^(?=.*dbo)(?=.*manual)'), SIEMENS_DOCUMENT_METADATA['dbo_manual']),
+    (re.compile(r'glossary|terms'), SIEMENS_DOCUMENT_METADATA['sustainability_glossary']),
+    (re.compile(r'xcelerator'), SIEMENS_DOCUMENT_METADATA['xcelerator_docs'])
+]
+_DEFAULT_METADATA = MappingProxyType({
+    'authority': 'medium',
+    'document_type': 'general',
+    'source': 'siemens_documentation'
+})
+
+# Minimum cosine similarity for a chunk to be returned by search_documents
+SIMILARITY_THRESHOLD = 0.65
+
+# Row codes for authority levels (others get the next free code when first seen)
+AUTHORITY_CODES = {'high': 0, 'medium': 1, 'low': 2, 'unknown': 3}
+
+# Files of a saved store: normalized embedding matrix, one JSON line per chunk (same row order), documents
+STORE_EMBEDDINGS_FILE = "embs.npy"
+STORE_CHUNKS_FILE = "chunks.jsonl"
+STORE_DOCUMENTS_FILE = "documents.json"
+
+# Search results cache: entries, and the cosine similarity above which a query counts as a repeat
+QUERY_CACHE_SIZE = 256
+QUERY_CACHE_SIMILARITY = 0.98
+
 class DocumentManager:
     """Manages multiple official documents and their processing"""
     
@@ -20,8 +70,26 @@ class DocumentManager:
         self.document_chunks = {}
         self.document_embeddings = {}
         
+        # Chunk counts for get_document_stats, kept up to date by add_chunk/remove_document
+        self._type_counts: Dict[str, int] = {}
+        self._authority_counts: Dict[str, int] = {}
+        
+        # Search index over document_embeddings. New chunks are appended to it before the
+        # next search; it is rebuilt only when a chunk is replaced. Authority-filtered
+        # searches mask the normalized matrix with a parallel array of authority codes
+        self._index = None
+        self._index_ids = []
+        self._pending_ids = []
+        self._matrix = None
+        self._authority_codes = np.empty(0, dtype=np.uint8)
+        self._authority_code_map = dict(AUTHORITY_CODES)
+        
+        # Results of recent searches, by exact (query, top_k, authority_filter) and by
+        # near-identical query embedding; cleared whenever the index changes
+        self._query_cache = SemanticCache(max_size=QUERY_CACHE_SIZE, similarity_threshold=QUERY_CACHE_SIMILARITY)
+        
     async def add_documents_from_directory(self, directory_path: str):
-        """Add all documents from a directory"""
+        """Add all documents from a directory (parsed in threads, embedded in shared batches)"""
         directory = Path(directory_path)
         
         if not directory.exists():
@@ -30,10 +98,28 @@ class DocumentManager:
         
         # Process all supported files
         supported_extensions = ['.pdf', '.docx', '.txt']
+        file_paths = [str(path) for path in directory.rglob('*') if path.suffix.lower() in supported_extensions]
+        if not file_paths:
+            return
+        
+        # Parse files concurrently (at most one per core), then embed all their chunks together
+        metadata_by_file = [self._get_metadata_for_file(Path(path).name.lower()) for path in file_paths]
+        parse_semaphore = asyncio.Semaphore(os.cpu_count() or 1)
+        
+        async def _extract(path, metadata):
+            async with parse_semaphore:
+                return await asyncio.to_thread(self.processor.extract_chunks, path, metadata)
+        
+        chunks_by_file = await asyncio.gather(*(
+            _extract(path, metadata) for path, metadata in zip(file_paths, metadata_by_file)
+        ))
+        embedded_ids = {
+            chunk['chunk_id']
+            for chunk in await self.processor.embed_chunks([chunk for chunks in chunks_by_file for chunk in chunks])
+        }
         
-        for file_path in directory.rglob('*'):
-            if file_path.suffix.lower() in supported_extensions:
-                await self.add_document(str(file_path))
+        for path, metadata, chunks in zip(file_paths, metadata_by_file, chunks_by_file):
+            self._store_document(path, metadata, [chunk for chunk in chunks if chunk['chunk_id'] in embedded_ids])
     
     async def add_document(self, file_path: str, metadata: Dict = None):
         """Add a single document to the system"""
@@ -47,73 +133,192 @@ class DocumentManager:
         
         # Process the document
         chunks = await self.processor.process_document(file_path, metadata)
-        
+        self._store_document(file_path, metadata, chunks)
+    
+    def _store_document(self, file_path: str, metadata: Dict, chunks: List[Dict]):
+        """Register a processed document and its embedded chunks"""
         if chunks:
             doc_id = Path(file_path).stem
+            if doc_id in self.documents:
+                self.remove_document(doc_id)  # Re-ingested: drop chunks the new version no longer has
             self.documents[doc_id] = {
                 'file_path': file_path,
                 'metadata': metadata,
-                'chunk_count': len(chunks)
+                'chunk_count': len(chunks),
+                'chunk_ids': [chunk['chunk_id'] for chunk in chunks]
             }
             
             # Store chunks and embeddings
             for chunk in chunks:
-                chunk_id = chunk['chunk_id']
-                self.document_chunks[chunk_id] = chunk
-                self.document_embeddings[chunk_id] = chunk['embedding']
+                self.add_chunk(chunk)
             
             logger.info(f"Added document {doc_id} with {len(chunks)} chunks")
         else:
             logger.warning(f"No chunks extracted from {file_path}")
     
-    def _get_metadata_for_file(self, filename: str) -> Dict:
-        """Get appropriate metadata based on filename"""
-        
-        if 'dbo' in filename and 'manual' in filename:
-            return SIEMENS_DOCUMENT_METADATA['dbo_manual'].copy()
-        elif 'glossary' in filename or 'terms' in filename:
-            return SIEMENS_DOCUMENT_METADATA['sustainability_glossary'].copy()
-        elif 'xcelerator' in filename:
-            return SIEMENS_DOCUMENT_METADATA['xcelerator_docs'].copy()
+    def add_chunk(self, chunk: Dict):
+        """Store an already-embedded chunk (normalized once here) and invalidate the search index"""
+        chunk_id = chunk['chunk_id']
+        embedding = np.array(chunk['embedding'], dtype=np.float32)
+        # The vector lives only in document_embeddings: a list of Python floats costs ~8x more
+        chunk = {key: value for key, value in chunk.items() if key != 'embedding'}
+        embedding /= np.linalg.norm(embedding) + 1e-12
+        if chunk_id in self.document_embeddings:
+            self._count_chunk(self.document_chunks[chunk_id], -1)
+            self._index = None  # Replaced vector: rebuild from scratch
         else:
-            return {
-                'authority': 'medium',
-                'document_type': 'general',
-                'source': 'siemens_documentation'
-            }
+            self._pending_ids.append(chunk_id)
+        self.document_chunks[chunk_id] = chunk
+        self.document_embeddings[chunk_id] = embedding
+        self._count_chunk(chunk, 1)
+    
+    def remove_document(self, doc_id: str):
+        """Remove a document and its chunks (the search index is rebuilt on the next search)"""
+        document = self.documents.pop(doc_id, None)
+        if document is None:
+            return
+        for chunk_id in document.get('chunk_ids', []):
+            chunk = self.document_chunks.pop(chunk_id, None)
+            if chunk is not None:
+                self.document_embeddings.pop(chunk_id, None)
+                self._count_chunk(chunk, -1)
+        self._index = None
+        logger.info(f"Removed document {doc_id}")
     
-    async def search_documents(self, query: str, top_k: int = 5, authority_filter: str = None) -> List[Dict]:
-        """Search across all documents with optional filtering"""
+    def save(self, path: str):
+        """Persist embeddings (.npy) and chunks/documents (JSON) so a restart can skip re-embedding"""
+        store = Path(path)
+        store.mkdir(parents=True, exist_ok=True)
+        chunk_ids = list(self.document_embeddings.keys())
+        if chunk_ids:
+            matrix = np.stack([self.document_embeddings[i] for i in chunk_ids])
+        else:
+            matrix = np.empty((0, 0), dtype=np.float32)
+        lines = []
+        for chunk_id in chunk_ids:
+            lines.append(orjson.dumps(self.document_chunks[chunk_id], option=orjson.OPT_SERIALIZE_NUMPY) + b"\n")
+        
+        # Write new files and swap them in: the old matrix may still be memory-mapped
+        with open(store / (STORE_EMBEDDINGS_FILE + ".tmp"), "wb") as f:
+            np.save(f, matrix)
+        (store / (STORE_CHUNKS_FILE + ".tmp")).write_bytes(b"".join(lines))
+        (store / (STORE_DOCUMENTS_FILE + ".tmp")).write_bytes(orjson.dumps(self.documents))
+        for name in (STORE_EMBEDDINGS_FILE, STORE_CHUNKS_FILE, STORE_DOCUMENTS_FILE):
+            os.replace(store / (name + ".tmp"), store / name)
+        logger.info(f"Saved {len(chunk_ids)} chunks to {path}")
+    
+    def load(self, path: str) -> bool:
+        """
+        Load a store written by save(). The embedding matrix is memory-mapped: rows are paged in
+        on demand and shared between worker processes. Returns False if there is no store at path
+        """
+        store = Path(path)
+        if not (store / STORE_EMBEDDINGS_FILE).exists():
+            return False
+        
+        try:
+            matrix = np.load(store / STORE_EMBEDDINGS_FILE, mmap_mode='r')
+            with open(store / STORE_CHUNKS_FILE, "rb") as f:
+                chunks = [orjson.loads(line) for line in f]
+            documents = orjson.loads((store / STORE_DOCUMENTS_FILE).read_bytes())
+        except Exception as e:
+            logger.error(f"Error loading document store {path}: {e}")
+            return False
+        if len(chunks) != len(matrix):
+            logger.error(f"Document store {path} is inconsistent: {len(chunks)} chunks, {len(matrix)} embeddings")
+            return False
+        
+        for chunk_id in list(self.document_chunks):
+            self._count_chunk(self.document_chunks.pop(chunk_id), -1)
+        self.document_embeddings = {}
+        self.documents = documents
+        for row, chunk in enumerate(chunks):
+            # Stored rows are already normalized; keep them as views into the mapped file
+            self.document_chunks[chunk['chunk_id']] = chunk
+            self.document_embeddings[chunk['chunk_id']] = matrix[row]
+            self._count_chunk(chunk, 1)
+        # Stored chunk texts will not be sent to the embeddings API again
+        self.processor.remember_embeddings(chunks, matrix)
+        
+        self._pending_ids = []
+        self._index = None
+        self._query_cache.clear()
+        if chunks:
+            self._rebuild_index(matrix)
+        logger.info(f"Loaded {len(chunks)} chunks from {path}")
+        return True
+    
+    def _count_chunk(self, chunk: Dict, delta: int):
+        """Add delta to the chunk's type and authority counters"""
+        for counts, key in ((self._type_counts, chunk.get('document_type', 'unknown')),
+                            (self._authority_counts, chunk.get('metadata', {}).get('authority', 'unknown'))):
+            count = counts.get(key, 0) + delta
+            if count:
+                counts[key] = count
+            else:
+                del counts[key]
+    
+    def _get_metadata_for_file(self, filename: str) -> Dict:
+        """Get appropriate metadata based on filename (a fresh dict: callers may extend it)"""
+        for pattern, metadata in _METADATA_PATTERNS:
+            if pattern.search(filename):
+                return dict(metadata)
+        return dict(_DEFAULT_METADATA)
+    
+    async def search_documents(self, query: str, top_k: int = 5, authority_filter: str = None,
+                               query_embedding: List[float] = None,
+                               embed_query: Optional[Callable[[str], Awaitable]] = None) -> List[Dict]:
+        """
+        Search across all documents with optional filtering. The query is embedded only on an
+        exact-cache miss: query_embedding if given, else embed_query(query), else the OpenAI API
+        """
         
         if not self.document_embeddings:
             logger.warning("No documents loaded")
             return []
         
         try:
-            # Create query embedding
-            response = await self.openai_client.embeddings.acreate(
-                model="text-embedding-3-small",
-                input=query
-            )
-            query_embedding = response.data[0].embedding
+            # Bring the index up to date if documents changed (this also drops stale cached results)
+            self._sync_index()
+            
+            # Literal repeat of a recent search
+            cache_key = (query, top_k, authority_filter)
+            cached_results = self._query_cache.get(cache_key)
+            if cached_results is not None:
+                return cached_results
+            
+            # Create query embedding (unless the caller already has one or embeds it itself)
+            if query_embedding is None and embed_query is not None:
+                query_embedding = await embed_query(query)
+            if query_embedding is None:
+                response = await asyncio.to_thread(
+                    self.openai_client.embeddings.create,
+                    model="text-embedding-3-small",
+                    input=query
+                )
+                query_embedding = response.data[0].embedding
+            
+            # Near-identical query (cosine similarity > 0.98) with the same top_k and filter
+            namespace = (top_k, authority_filter)
+            cached_results = self._query_cache.get_similar(query_embedding, namespace=namespace)
+            if cached_results is not None:
+                return cached_results
             
             # Calculate similarities
-            similarities = {}
-            for chunk_id, chunk_embedding in self.document_embeddings.items():
-                chunk = self.document_chunks[chunk_id]
-                
-                # Apply authority filter if specified
-                if authority_filter and chunk['metadata'].get('authority') != authority_filter:
-                    continue
-                
-                similarity = self._cosine_similarity(query_embedding, chunk_embedding)
-                similarities[chunk_id] = similarity
+            query_vector = np.asarray(query_embedding, dtype=np.float32)
+            query_vector = query_vector / (np.linalg.norm(query_vector) + 1e-12)
+            
+            if authority_filter:
+                candidates = self._search_filtered(query_vector, top_k, authority_filter)
+            else:
+                candidates = self._search_index(query_vector, min(top_k, len(self._index_ids)))
             
             # Get top results
             results = []
-            for chunk_id, similarity in sorted(similarities.items(), key=lambda x: x[1], reverse=True)[:top_k]:
-                if similarity > 0.65:  # Confidence threshold
-                    chunk = self.document_chunks[chunk_id]
+            for chunk_id, similarity in candidates:
+                chunk = self.document_chunks[chunk_id]
+                
+                if similarity > SIMILARITY_THRESHOLD:  # Confidence threshold
                     results.append({
                         'chunk_id': chunk_id,
                         'content': chunk['content'],
@@ -124,17 +329,114 @@ class DocumentManager:
                         'similarity': similarity
                     })
             
+            self._query_cache.put(cache_key, query_vector, results, namespace=namespace)
             return results
             
         except Exception as e:
             logger.error(f"Error in document search: {e}")
             return []
     
-    def _cosine_similarity(self, vec1, vec2):
-        """Calculate cosine similarity between two vectors"""
-        import numpy as np
-        vec1, vec2 = np.array(vec1), np.array(vec2)
-        return np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2))
+    def _sync_index(self):
+        """Append chunks added since the last search to the index, or rebuild it if needed"""
+        if self._index is None or self._pending_ids:
+            self._query_cache.clear()
+        if self._index is None:
+            self._rebuild_index()
+        elif self._pending_ids:
+            if len(self._index_ids) < HNSW_MIN_CHUNKS <= len(self.document_embeddings):
+                self._rebuild_index()  # Crossed into HNSW territory
+            else:
+                self._append_to_index(self._pending_ids)
+        self._pending_ids = []
+    
+    def _rebuild_index(self, matrix: Optional[np.ndarray] = None):
+        """
+        Build the similarity index from the current (already normalized) document embeddings;
+        matrix, if given, already holds them in document_embeddings order
+        """
+        self._index_ids = list(self.document_embeddings.keys())
+        self._matrix = matrix if matrix is not None else np.stack([self.document_embeddings[i] for i in self._index_ids])
+        self._authority_codes = self._encode_authorities(self._index_ids)
+        
+        dimension = self._matrix.shape[1]
+        use_hnsw = len(self._index_ids) >= HNSW_MIN_CHUNKS
+        if FAISS_AVAILABLE:
+            if use_hnsw:
+                self._index = faiss.IndexHNSWFlat(dimension, 32, faiss.METRIC_INNER_PRODUCT)
+            else:
+                self._index = faiss.IndexFlatIP(dimension)
+            self._index.add(self._matrix)
+        elif HNSWLIB_AVAILABLE and use_hnsw:
+            self._index = hnswlib.Index(space='ip', dim=dimension)
+            self._index.init_index(max_elements=2 * len(self._index_ids), ef_construction=200, M=16)
+            self._index.add_items(self._matrix, np.arange(len(self._index_ids)))
+            self._index.set_ef(64)
+        else:
+            # Fallback: keep the normalized matrix and search with a BLAS matmul
+            self._index = self._matrix
+        
+        logger.info(f"Built search index over {len(self._index_ids)} chunks")
+    
+    def _append_to_index(self, chunk_ids: List[str]):
+        """Add new chunks to the existing index without re-inserting the old ones"""
+        base = len(self._index_ids)
+        vectors = np.stack([self.document_embeddings[i] for i in chunk_ids])
+        self._index_ids.extend(chunk_ids)
+        self._matrix = np.concatenate([self._matrix, vectors])
+        self._authority_codes = np.concatenate([self._authority_codes, self._encode_authorities(chunk_ids)])
+        
+        if isinstance(self._index, np.ndarray):
+            self._index = self._matrix
+        elif FAISS_AVAILABLE:
+            self._index.add(vectors)
+        else:
+            if len(self._index_ids) > self._index.get_max_elements():
+                self._index.resize_index(2 * len(self._index_ids))
+            self._index.add_items(vectors, np.arange(base, len(self._index_ids)))
+    
+    def _encode_authorities(self, chunk_ids: List[str]) -> np.ndarray:
+        """uint8 authority codes of the chunks, in order"""
+        code_map = self._authority_code_map
+        codes = [
+            code_map.setdefault(self.document_chunks[i].get('metadata', {}).get('authority', 'unknown'), len(code_map))
+            for i in chunk_ids
+        ]
+        return np.array(codes, dtype=np.uint8)
+    
+    def _search_index(self, query_vector: np.ndarray, k: int) -> List[tuple]:
+        """Return (chunk_id, similarity) pairs for the k most similar chunks"""
+        if isinstance(self._index, np.ndarray):
+            # Only chunks above the confidence threshold can be returned: rank just those
+            similarities = self._index @ query_vector
+            rows = np.flatnonzero(similarities > SIMILARITY_THRESHOLD)
+            top_rows = rows[self._top_k(similarities[rows], k)]
+            return [(self._index_ids[i], float(similarities[i])) for i in top_rows]
+        
+        if FAISS_AVAILABLE:
+            scores, indices = self._index.search(query_vector[None, :], k)
+            return [(self._index_ids[i], float(score)) for i, score in zip(indices[0], scores[0]) if i >= 0]
+        
+        # hnswlib 'ip' distance is 1 - inner product
+        labels, distances = self._index.knn_query(query_vector, k=k)
+        return [(self._index_ids[i], 1.0 - float(distance)) for i, distance in zip(labels[0], distances[0])]
+    
+    def _search_filtered(self, query_vector: np.ndarray, k: int, authority: str) -> List[tuple]:
+        """Exact search over the rows of one authority level (vectorized code mask, no per-chunk lookups)"""
+        code = self._authority_code_map.get(authority)
+        if code is None:
+            return []
+        similarities = self._matrix @ query_vector
+        rows = np.flatnonzero((self._authority_codes == code) & (similarities > SIMILARITY_THRESHOLD))
+        top_rows = rows[self._top_k(similarities[rows], k)]
+        return [(self._index_ids[i], float(similarities[i])) for i in top_rows]
+    
+    @staticmethod
+    def _top_k(similarities: np.ndarray, k: int) -> np.ndarray:
+        """Indices of the k largest similarities, best first (argpartition, then sort only those k)"""
+        if k >= similarities.shape[0]:
+            return np.argsort(-similarities)
+        top_indices = np.argpartition(-similarities, k)[:k]
+        return top_indices[np.argsort(-similarities[top_indices])]
     
     def get_document_stats(self) -> Dict:
         """Get statistics about loaded documents"""
@@ -147,16 +449,8 @@ class DocumentManager:
     
     def _get_docs_by_type(self) -> Dict:
         """Group documents by type"""
-        type_counts = {}
-        for chunk in self.document_chunks.values():
-            doc_type = chunk['document_type']
-            type_counts[doc_type] = type_counts.get(doc_type, 0) + 1
-        return type_counts
+        return dict(self._type_counts)
     
     def _get_docs_by_authority(self) -> Dict:
         """Group documents by authority level"""
-        authority_counts = {}
-        for chunk in self.document_chunks.values():
-            authority = chunk['metadata'].get('authority', 'unknown')
-            authority_counts[authority] = authority_counts.get(authority, 0) + 1
-        return authority_counts
\ No newline at end of file
+        return dict(self._authority_counts)
@@ -4,11 +4,15 @@ Handles PDFs, Word docs, text files, and structured data
 """
 
 import asyncio
+import hashlib
 import logging
+import random
 from typing import Dict, List, Optional, Tuple
 import re
 from pathlib import Path
+import numpy as np
 import openai
+from app.utils.embedding_cache import EMBEDDING_BATCH_SIZE
 
 # For PDF processing
 try:
@@ -25,18 +29,55 @@ try:
 except ImportError:
     DOCX_AVAILABLE = False
 
+# Fast content hashing for embedding dedup (blake2b without it)
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# Embeddings requests in flight at once per processor
+MAX_CONCURRENT_BATCHES = 5
+
+# Retries of a rate-limited (429) embeddings request, with exponential backoff + jitter
+EMBEDDING_MAX_RETRIES = 5
+EMBEDDING_RETRY_BASE_DELAY = 1.0
+EMBEDDING_RETRY_MAX_DELAY = 30.0
+
+
+def content_hash(content: str) -> bytes:
+    """128-bit hash of chunk text (xxh3, blake2b without xxhash)"""
+    data = content.encode()
+    if XXHASH_AVAILABLE:
+        return xxhash.xxh3_128_digest(data)
+    return hashlib.blake2b(data, digest_size=16).digest()
+
 class AdvancedDocumentProcessor:
     """Advanced document processing with intelligent chunking"""
     
-    def __init__(self, openai_client):
+    def __init__(self, openai_client, max_concurrent_batches: int = MAX_CONCURRENT_BATCHES):
         self.openai_client = openai_client
         self.chunk_size = 1000
         self.chunk_overlap = 200
+        self.embedding_batch_size = EMBEDDING_BATCH_SIZE
+        self.max_concurrent_batches = max_concurrent_batches
+        
+        # Content hash -> embedding of every chunk text embedded so far (or restored from a
+        # saved store), so repeated text (footers, shared definitions) is never re-embedded
+        self._content_to_embedding: Dict[bytes, np.ndarray] = {}
         
     async def process_document(self, file_path: str, document_metadata: Dict = None) -> List[Dict]:
         """Process a document and return intelligent chunks"""
+        chunks = await asyncio.to_thread(self.extract_chunks, file_path, document_metadata)
+        processed_chunks = await self.embed_chunks(chunks)
+        
+        logger.info(f"Processed {len(processed_chunks)} chunks from {Path(file_path).name}")
+        return processed_chunks
+    
+    def extract_chunks(self, file_path: str, document_metadata: Dict = None) -> List[Dict]:
+        """Extract and chunk a document's text, without embeddings (CPU-bound; run in a thread)"""
         
         file_path = Path(file_path)
         
@@ -61,25 +102,78 @@ class AdvancedDocumentProcessor:
         
         # Intelligent chunking
         chunks = self._intelligent_chunk_document(text, file_path.name, document_metadata)
-        
-        # Create embeddings for chunks
-        processed_chunks = []
         for i, chunk in enumerate(chunks):
+            chunk['chunk_id'] = f"{file_path.stem}_{i}"
+        return chunks
+    
+    def remember_embeddings(self, chunks: List[Dict], embeddings):
+        """Seed the content-hash cache with already-embedded chunks (e.g. loaded from disk)"""
+        for chunk, embedding in zip(chunks, embeddings):
+            self._content_to_embedding[content_hash(chunk['content'])] = embedding
+    
+    async def embed_chunks(self, chunks: List[Dict]) -> List[Dict]:
+        """
+        Embed chunks with one request per embedding_batch_size distinct texts (they may come
+        from many documents), max_concurrent_batches requests at a time; returns the chunks
+        that got an embedding, in input order. Text that was embedded before, or repeats
+        within the call, reuses that embedding instead of a new API input
+        """
+        # Content hash -> the chunks carrying that text that still need an embedding
+        pending: Dict[bytes, List[Dict]] = {}
+        for chunk in chunks:
+            key = content_hash(chunk['content'])
+            embedding = self._content_to_embedding.get(key)
+            if embedding is not None:
+                chunk['embedding'] = embedding
+            else:
+                pending.setdefault(key, []).append(chunk)
+        
+        reused = len(chunks) - sum(len(group) for group in pending.values())
+        if reused:
+            logger.info(f"♻️ Reused embeddings for {reused} of {len(chunks)} chunks with known content")
+        
+        unique = list(pending.items())
+        batch_semaphore = asyncio.Semaphore(self.max_concurrent_batches)
+        
+        async def _embed_batch(offset: int):
+            batch = unique[offset:offset + self.embedding_batch_size]
             try:
-                embedding_response = await self.openai_client.embeddings.acreate(
-                    model="text-embedding-3-small",
-                    input=chunk['content']
-                )
-                
-                chunk['embedding'] = embedding_response.data[0].embedding
-                chunk['chunk_id'] = f"{file_path.stem}_{i}"
-                processed_chunks.append(chunk)
+                async with batch_semaphore:
+                    response = await self._create_embeddings([group[0]['content'] for _, group in batch])
+                for item in response.data:
+                    key, group = unique[offset + item.index]
+                    # float32 array: an eighth of the size of a list of floats, shared by the group
+                    embedding = np.asarray(item.embedding, dtype=np.float32)
+                    self._content_to_embedding[key] = embedding
+                    for chunk in group:
+                        chunk['embedding'] = embedding
                 
             except Exception as e:
-                logger.error(f"Error creating embedding for chunk {i}: {e}")
+                logger.error(f"Error creating embeddings for chunks {batch[0][1][0]['chunk_id']}..{batch[-1][1][0]['chunk_id']}: {e}")
         
-        logger.info(f"Processed {len(processed_chunks)} chunks from {file_path.name}")
-        return processed_chunks
+        # Up to max_concurrent_batches requests in flight; results land by batch offset
+        await asyncio.gather(*(_embed_batch(offset) for offset in range(0, len(unique), self.embedding_batch_size)))
+        
+        # Input order preserved; failed batches are skipped
+        return [chunk for chunk in chunks if 'embedding' in chunk]
+    
+    async def _create_embeddings(self, inputs: List[str]):
+        """One embeddings request, retried with exponential backoff while rate limited"""
+        for attempt in range(EMBEDDING_MAX_RETRIES + 1):
+            try:
+                # The sync OpenAI client runs in a worker thread to keep the event loop free
+                return await asyncio.to_thread(
+                    self.openai_client.embeddings.create,
+                    model="text-embedding-3-small",
+                    input=inputs
+                )
+            except openai.RateLimitError:
+                if attempt == EMBEDDING_MAX_RETRIES:
+                    raise
+                delay = min(EMBEDDING_RETRY_MAX_DELAY, EMBEDDING_RETRY_BASE_DELAY * 2 ** attempt)
+                delay *= random.uniform(0.5, 1.0)  # Jitter: concurrent callers don't retry in lockstep
+                logger.warning(f"⏳ Embeddings rate limited, retrying in {delay:.1f}s ({attempt + 1}/{EMBEDDING_MAX_RETRIES})")
+                await asyncio.sleep(delay)
     
     def _extract_pdf_text(self, file_path: Path) -> str:
         """Extract text from PDF file"""
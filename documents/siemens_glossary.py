@@ -1,10 +1,12 @@
 import json
 from pathlib import Path
+from types import MappingProxyType
 
 GLOSSARY_PATH = Path(__file__).parent / "full_siemens_glossary.json"
 
 with open(GLOSSARY_PATH, encoding="utf-8") as f:
-    SIEMENS_OFFICIAL_CONTENT = json.load(f)
+    # Read-only view: the official content is shared by every caller
+    SIEMENS_OFFICIAL_CONTENT = MappingProxyType(json.load(f))
 
 def get_all_document_chunks():
     """Return all official Siemens glossary/document chunks."""
@@ -1,31 +1,23 @@
 # main.py - Complete updated version with RAG, Auth, and all new endpoints
 
-from fastapi import FastAPI
+from fastapi import APIRouter, FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from datetime import datetime
+import asyncio
 import logging
+import orjson
+from contextlib import asynccontextmanager
+from functools import lru_cache
 from dotenv import load_dotenv
 import os
+import time
 from pathlib import Path
 from documents.document_manager import DocumentManager
 from monitoring.document_watcher import DocumentWatcher
 
-# Import all routers
-from app.routes.chat import router as chat_router
-from app.routes.dbo import router as dbo_router
-from app.routes.analytics import router as analytics_router
-from app.routes.integration import router as integration_router
-from app.services.auth_service import auth_router
-
-# Import services
-from app.services.dbo_service import dbo_service
-from app.services.rag_agent_service import rag_agent  # New RAG service instead of LangChain
-from app.services.xcelerator_service import xcelerator_service
-from app.services.supabase_service import db_service
-
 # Add to imports
 from app.services.vector_db.pinecone_integration import PineconeDocumentRAG
-from app.services.vector_db.document_manager import DocumentManager
 from app.utils.document_watcher import DocumentWatcher
 
 #vector_db_import
@@ -46,35 +38,90 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Services are imported on first use so importing this module (reloads, tests,
+# tooling) doesn't build the OpenAI/Supabase clients or the embedding tables
+@lru_cache(maxsize=1)
+def get_rag_agent():
+    """Base RAG agent (New RAG service instead of LangChain)"""
+    from app.services.rag_agent_service import get_rag_agent as build_rag_agent
+    return build_rag_agent()
+
+@lru_cache(maxsize=1)
+def get_dbo_service():
+    from app.services.dbo_service import dbo_service
+    return dbo_service
+
+@lru_cache(maxsize=1)
+def get_xcelerator_service():
+    from app.services.xcelerator_service import xcelerator_service
+    return xcelerator_service
+
+@lru_cache(maxsize=1)
+def get_db_service():
+    from app.services.supabase_service import db_service
+    return db_service
+
+# Enterprise wrapper around the base agent, set up in startup_event
+rag_agent = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize services on startup and clean up on shutdown"""
+    await startup_event()
+    yield
+    await shutdown_event()
+
+# Swagger/ReDoc pull in the OpenAPI model tree, so on dev reloads they are
+# off unless ENABLE_DOCS=1; outside development they default to on.
+# Development (auto-reload) must be asked for explicitly.
+ENVIRONMENT = os.getenv("ENVIRONMENT", "production")
+ENABLE_DOCS = os.getenv("ENABLE_DOCS", "0" if ENVIRONMENT == "development" else "1") == "1"
+
 # Create FastAPI app
 app = FastAPI(
     title="SustAInability Navigator - RAG Enhanced with Supabase",
     description="AI-powered sustainability assistant with RAG architecture, structured responses, and authentication",
     version="3.0.0",
-    docs_url="/docs",
-    redoc_url="/redoc"
+    docs_url="/docs" if ENABLE_DOCS else None,
+    redoc_url="/redoc" if ENABLE_DOCS else None,
+    openapi_url="/openapi.json" if ENABLE_DOCS else None,
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # CORS settings - Updated for frontend integration
+# Explicit allowlist (no "*"): with credentials enabled, a wildcard makes every
+# response echo the request Origin
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=[
+    allow_origins=(
         "https://spectacular-dusk-cc7b08.netlify.app",  # Frontend
         "http://localhost:3000",  # Local frontend development
         "http://localhost:3001",  # Alternative local port
         "http://localhost:5173",  # Vite default port
-        "*"  # Be careful with this in production
-    ],
+    ),
     allow_credentials=True,
-    allow_methods=["*"],
+    allow_methods=("GET", "POST"),  # every route is GET or POST
     allow_headers=["*"],
 )
 
 class EnterpriseRAGAgent:
     """Enterprise wrapper for existing RAG agent with document intelligence"""
     
+    # Attributes used on every chat turn; bound directly to skip __getattr__
+    HOT_DELEGATED_ATTRS = (
+        "process_message",
+        "_get_embedding",
+        "openai_client",
+        "conversation_memory",
+        "response_cache"
+    )
+    
     def __init__(self, base_rag_agent):
         self.base_rag_agent = base_rag_agent
+        for name in self.HOT_DELEGATED_ATTRS:
+            if hasattr(base_rag_agent, name):
+                setattr(self, name, getattr(base_rag_agent, name))
         self.document_manager = None
         self.vector_db = None
         self.document_watcher = None
@@ -163,47 +210,73 @@ class EnterpriseRAGAgent:
         for dir_path in document_dirs:
             Path(dir_path).mkdir(parents=True, exist_ok=True)
         
+        # Warm start: embeddings saved by a previous run (memory-mapped, no API calls)
+        store_path = os.getenv("DOCUMENT_STORE_PATH")
+        if store_path and self.document_manager.load(store_path):
+            logger.info(f"💾 Loaded document store from {store_path}")
+        
         # Load from the siemens_glossary.py (your hardcoded official content)
         from documents.siemens_glossary import get_all_document_chunks
         official_content = get_all_document_chunks()
+        stored_chunks = self.document_manager.document_chunks
         
-        # Process official content into document chunks
-        document_count = 0
+        pending_items = []
+        stored_count = 0
         for doc_id, doc_data in official_content.items():
-            try:
-                # Create embedding for the content
-                response = self.base_rag_agent.openai_client.embeddings.create(
-                    model="text-embedding-3-small",
-                    input=doc_data["content"]
-                )
-                
-                # Store in document manager
-                chunk = {
-                    'chunk_id': doc_id,
-                    'content': doc_data["content"],
-                    'section_title': doc_data.get("section", "Official Definition"),
-                    'source_document': doc_data["source"],
-                    'document_type': 'official_glossary',
-                    'metadata': {
-                        'authority': doc_data["authority"],
-                        'keywords': doc_data.get("keywords", [])
-                    },
-                    'embedding': response.data[0].embedding
-                }
-                
-                self.document_manager.document_chunks[doc_id] = chunk
-                self.document_manager.document_embeddings[doc_id] = response.data[0].embedding
-                document_count += 1
-                
-            except Exception as e:
-                logger.error(f"Error processing document {doc_id}: {e}")
+            stored_chunk = stored_chunks.get(doc_id)
+            if stored_chunk is not None and stored_chunk['content'] == doc_data["content"]:
+                stored_count += 1  # Unchanged since the store was saved
+                continue
+            pending_items.append((doc_id, doc_data))
+        
+        # Embed through the persistent embedding cache (in a worker thread, under the
+        # embedding cap): restarts and repeated texts are served without API calls
+        embeddings = await self._embed_in_thread(
+            self._get_embeddings, [doc_data["content"] for _, doc_data in pending_items]
+        ) if pending_items else []
+        
+        # Process official content into document chunks
+        document_count = stored_count
+        for (doc_id, doc_data), embedding in zip(pending_items, embeddings):
+            if len(embedding) == 0:
+                logger.error(f"Error creating embedding for document {doc_id}")
+                continue
+            self._store_official_document(doc_id, doc_data, embedding)
+            document_count += 1
         
         logger.info(f"✅ Loaded {document_count} official Siemens documents")
         
-        # Also load from directories if they contain files
-        for dir_path in document_dirs:
-            if any(Path(dir_path).iterdir()):
-                await self.document_manager.add_documents_from_directory(dir_path)
+        # Also load from directories if they contain files (concurrently)
+        dirs_with_files = [d for d in document_dirs if any(Path(d).iterdir())]
+        if dirs_with_files:
+            # Limit parallel ingests to avoid embedding API rate-limit bursts
+            ingest_semaphore = asyncio.Semaphore(2)
+            
+            async def _ingest_directory(dir_path):
+                async with ingest_semaphore:
+                    await self.document_manager.add_documents_from_directory(dir_path)
+            
+            await asyncio.gather(*(_ingest_directory(d) for d in dirs_with_files))
+        
+        if store_path:
+            self.document_manager.save(store_path)
+    
+    def _store_official_document(self, doc_id: str, doc_data: dict, embedding):
+        """Store an embedded official document in the document manager"""
+        chunk = {
+            'chunk_id': doc_id,
+            'content': doc_data["content"],
+            'section_title': doc_data.get("section", "Official Definition"),
+            'source_document': doc_data.get("source", "Siemens Glossary of Sustainability Terms"),
+            'document_type': 'official_glossary',
+            'metadata': {
+                'authority': doc_data.get("authority", "high"),
+                'keywords': doc_data.get("keywords", [])
+            },
+            'embedding': embedding
+        }
+        
+        self.document_manager.add_chunk(chunk)
     
     async def _start_document_monitoring(self):
         """Start monitoring document directories for changes"""
@@ -222,10 +295,19 @@ class EnterpriseRAGAgent:
     
     async def search_documents(self, query: str, top_k: int = 3):
         """Search through official documents"""
-        if self.document_manager:
-            return await self.document_manager.search_documents(query, top_k)
-        else:
+        if not self.document_manager:
             return []
+        
+        # Repeated and near-duplicate queries are answered from the document manager's cache;
+        # the query is only embedded (LRU-cached, in a thread) when it is not a literal repeat
+        return await self.document_manager.search_documents(
+            query, top_k, embed_query=self._embed_search_query
+        )
+    
+    async def _embed_search_query(self, query: str):
+        """Query embedding for document search, or None if it failed (the document manager retries)"""
+        query_embedding = await self._embed_in_thread(self._get_embedding, query)
+        return query_embedding if len(query_embedding) > 0 else None
     
     def get_enterprise_stats(self):
         """Get enterprise system statistics"""
@@ -247,75 +329,114 @@ class EnterpriseRAGAgent:
         
         return stats
     
-    # Delegate all other methods to the base RAG agent
+    # Delegate all other (rarely used) attributes to the base RAG agent
     def __getattr__(self, name):
         return getattr(self.base_rag_agent, name)
 
 
+# Static payload, serialized once at import
+ROOT_PAYLOAD = {
+    "message": "SustAInability Navigator - RAG Enhanced Version",
+    "version": "3.0.0",
+    "status": "healthy",
+    "architecture": "RAG with Embeddings (No LangChain)",
+    "features": [
+        "RAG-based Agent with Embeddings",
+        "5-Cluster Security System",
+        "Structured Chat Responses",
+        "User Authentication (JWT)",
+        "Supabase Database Integration",
+        "Chat History Management",
+        "DBO Tool Integration",
+        "Xcelerator Marketplace Matching",
+        "Persona Intelligence"
+    ],
+    "api_endpoints": {
+        "authentication": {
+            "login": "POST /auth/login",
+            "register": "POST /auth/register",
+            "me": "GET /auth/me"
+        },
+        "chat": {
+            "chat": "POST /chat/",
+            "history": "GET /get_chat_history/{chat_ID}",
+            "list": "GET /get_chats/"
+        },
+        "user": {
+            "save_params": "POST /save_user_info/",
+            "get_params": "GET /get_user_info/"
+        },
+        "dbo": {
+            "scenarios": "GET /api/v1/dbo/scenarios",
+            "scenario_detail": "POST /api/v1/dbo/scenario",
+            "search": "GET /api/v1/dbo/scenarios/search"
+        },
+        "system": {
+            "health": "GET /health",
+            "info": "GET /api/v1/system/info"
+        }
+    },
+    "security": {
+        "authentication": "JWT-based",
+        "prompt_security": "5-cluster system",
+        "jailbreak_protection": "Active",
+        "role_boundaries": "Enforced"
+    }
+}
+_ROOT_JSON = orjson.dumps(ROOT_PAYLOAD)
+
 @app.get("/")
 def read_root():
+    return Response(content=_ROOT_JSON, media_type="application/json")
+
+# /health is polled by load balancers, so the payload is cached briefly and
+# refreshed in the background (stale-while-revalidate)
+HEALTH_CACHE_TTL = 1.0
+HEALTH_MAX_STALENESS = 30.0
+_HEALTH_CACHE = {"at": 0.0, "payload": None, "task": None}
+
+@lru_cache(maxsize=1)
+def _static_health_sections():
+    """Parts of the health payload that don't change after startup"""
+    state = app.state
     return {
-        "message": "SustAInability Navigator - RAG Enhanced Version",
-        "version": "3.0.0",
-        "status": "healthy",
-        "architecture": "RAG with Embeddings (No LangChain)",
-        "features": [
-            "RAG-based Agent with Embeddings",
-            "5-Cluster Security System",
-            "Structured Chat Responses",
-            "User Authentication (JWT)",
-            "Supabase Database Integration",
-            "Chat History Management",
-            "DBO Tool Integration",
-            "Xcelerator Marketplace Matching",
-            "Persona Intelligence"
-        ],
-        "api_endpoints": {
-            "authentication": {
-                "login": "POST /auth/login",
-                "register": "POST /auth/register",
-                "me": "GET /auth/me"
-            },
-            "chat": {
-                "chat": "POST /chat/",
-                "history": "GET /get_chat_history/{chat_ID}",
-                "list": "GET /get_chats/"
-            },
-            "user": {
-                "save_params": "POST /save_user_info/",
-                "get_params": "GET /get_user_info/"
-            },
-            "dbo": {
-                "scenarios": "GET /api/v1/dbo/scenarios",
-                "scenario_detail": "POST /api/v1/dbo/scenario",
-                "search": "GET /api/v1/dbo/scenarios/search"
-            },
-            "system": {
-                "health": "GET /health",
-                "info": "GET /api/v1/system/info"
-            }
+        "integration_status": {
+            "ai_architecture": "RAG with embeddings",
+            "security_model": "5-cluster system",
+            "structured_responses": "enabled",
+            "user_profiles": "enabled",
+            "chat_persistence": "enabled",
+            "authentication": "JWT-based"
         },
-        "security": {
-            "authentication": "JWT-based",
-            "prompt_security": "5-cluster system",
-            "jailbreak_protection": "Active",
-            "role_boundaries": "Enforced"
+        "configuration": {
+            "external_access": state.external_access_enabled,
+            "strict_boundaries": state.strict_role_boundaries,
+            "cache_enabled": True,
+            "embedding_model": state.embedding_model,
+            "chat_model": state.chat_model
         }
     }
 
-@app.get("/health")
-def health_check():
+def _build_health_payload():
     """Enhanced health check with all services status"""
+    state = app.state
+    db_service = state.db_service
+    dbo_service = state.dbo_service
+    xcelerator_service = state.xcelerator_service
+    static_sections = _static_health_sections()
     
     # Check RAG agent status
+    base_rag_agent = state.base_rag_agent
     rag_status = "operational"
     try:
-        if hasattr(rag_agent, 'dbo_embeddings') and len(rag_agent.dbo_embeddings) > 0:
+        if not base_rag_agent.is_ready:
+            rag_status = "initializing"
+        elif len(base_rag_agent.dbo_ids) > 0:
             rag_status = "operational"
         else:
             rag_status = "degraded"
-    except:
-        rag_status = "error"
+    except (AttributeError, TypeError):  # agent missing or embeddings not a sized container
+        rag_status = "degraded"
     
     # Check database status
     db_status = "operational"
@@ -325,9 +446,12 @@ def health_check():
             db_status = "operational"
         else:
             db_status = "not_initialized"
-    except:
+    except (AttributeError, ConnectionError):
         db_status = "error"
     
+    scenario_count = len(dbo_service.scenarios) if dbo_service else 0
+    product_count = len(xcelerator_service.xcelerator_catalog) if xcelerator_service else 0
+    
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
@@ -335,225 +459,267 @@ def health_check():
         "services": {
             "rag_agent": rag_status,
             "embeddings": {
-                "dbo_scenarios": len(getattr(rag_agent, 'dbo_embeddings', {})),
-                "xcelerator_products": len(getattr(rag_agent, 'product_embeddings', {}))
+                "dbo_scenarios": len(getattr(base_rag_agent, 'dbo_ids', [])),
+                "xcelerator_products": len(getattr(base_rag_agent, 'product_ids', []))
             },
             "database": db_status,
             "dbo_service": "operational" if dbo_service else "error",
             "xcelerator_service": "operational" if xcelerator_service else "error",
-            "scenarios_loaded": len(dbo_service.scenarios) if dbo_service else 0,
-            "xcelerator_products": len(xcelerator_service.xcelerator_catalog) if xcelerator_service else 0
+            "scenarios_loaded": scenario_count,
+            "xcelerator_products": product_count
         },
         "integration_status": {
-            "dbo_scenarios": f"{len(dbo_service.scenarios) if dbo_service else 0} scenarios loaded",
-            "xcelerator_catalog": f"{len(xcelerator_service.xcelerator_catalog) if xcelerator_service else 0} products available",
-            "ai_architecture": "RAG with embeddings",
-            "security_model": "5-cluster system",
-            "structured_responses": "enabled",
-            "user_profiles": "enabled",
-            "chat_persistence": "enabled",
-            "authentication": "JWT-based"
+            "dbo_scenarios": f"{scenario_count} scenarios loaded",
+            "xcelerator_catalog": f"{product_count} products available",
+            **static_sections["integration_status"]
         },
-        "configuration": {
-            "external_access": getattr(rag_agent, 'external_access_enabled', False),
-            "strict_boundaries": getattr(rag_agent, 'strict_role_boundaries', True),
-            "cache_enabled": True,
-            "embedding_model": getattr(rag_agent, 'embedding_model', 'unknown'),
-            "chat_model": getattr(rag_agent, 'chat_model', 'unknown')
-        }
+        "configuration": static_sections["configuration"]
     }
 
+async def _refresh_health():
+    try:
+        _HEALTH_CACHE["payload"] = _build_health_payload()
+        _HEALTH_CACHE["at"] = time.monotonic()
+    finally:
+        _HEALTH_CACHE["task"] = None
+
+@app.get("/health")
+async def health_check():
+    """Enhanced health check with all services status (cached for HEALTH_CACHE_TTL seconds)"""
+    age = time.monotonic() - _HEALTH_CACHE["at"]
+    
+    if _HEALTH_CACHE["payload"] is None or age >= HEALTH_MAX_STALENESS:
+        await _refresh_health()
+    elif age >= HEALTH_CACHE_TTL and _HEALTH_CACHE["task"] is None:
+        # Serve the stale payload now, refresh for the next probe
+        _HEALTH_CACHE["task"] = asyncio.create_task(_refresh_health())
+    
+    return _HEALTH_CACHE["payload"]
+
+# Static payload, serialized once at import
+SYSTEM_INFO_PAYLOAD = {
+    "available_personas": [
+        {"id": "zuri", "name": "Zuri", "description": "Enterprise Sustainability Leader"},
+        {"id": "amina", "name": "Amina", "description": "Cost-Conscious Business Owner"},
+        {"id": "bjorn", "name": "Björn", "description": "Siemens Customer"},
+        {"id": "arjun", "name": "Arjun", "description": "Sustainability Champion"},
+        {"id": "general", "name": "General", "description": "Default Assistant"}
+    ],
+    "available_actions": [
+        {
+            "action_type": "select_dbo_scenario",
+            "description": "Explore a specific DBO scenario",
+            "icon": "folder"
+        },
+        {
+            "action_type": "contact_expert",
+            "description": "Connect with a Siemens expert",
+            "icon": "user"
+        },
+        {
+            "action_type": "provide_information",
+            "description": "Provide additional information",
+            "icon": "info"
+        },
+        {
+            "action_type": "use_tool",
+            "description": "Use a sustainability tool",
+            "icon": "tool"
+        },
+        {
+            "action_type": "browse",
+            "description": "Browse scenarios or products",
+            "icon": "search"
+        }
+    ],
+    "supported_languages": ["en"],  # Can be extended later
+    "features": {
+        "dbo_scenarios": True,
+        "xcelerator_marketplace": True,
+        "rag_search": True,
+        "embeddings": True,
+        "chat_history": True,
+        "user_profiles": True,
+        "authentication": True,
+        "carbon_calculator": False,  # Coming soon
+        "roi_calculator": False,     # Coming soon
+        "expert_chat": True
+    },
+    "security_features": {
+        "jailbreak_protection": True,
+        "prompt_integrity": True,
+        "role_boundaries": True,
+        "audit_logging": True,
+        "data_privacy": True
+    },
+    "api_version": "3.0.0",
+    "build_date": datetime.now().strftime("%Y-%m-%d")  # process start, i.e. per deploy
+}
+_SYSTEM_INFO_JSON = orjson.dumps(SYSTEM_INFO_PAYLOAD)
+
 @app.get("/api/v1/system/info")
 def get_system_info():
     """System information for frontend initialization"""
-    return {
-        "available_personas": [
-            {"id": "zuri", "name": "Zuri", "description": "Enterprise Sustainability Leader"},
-            {"id": "amina", "name": "Amina", "description": "Cost-Conscious Business Owner"},
-            {"id": "bjorn", "name": "Björn", "description": "Siemens Customer"},
-            {"id": "arjun", "name": "Arjun", "description": "Sustainability Champion"},
-            {"id": "general", "name": "General", "description": "Default Assistant"}
-        ],
-        "available_actions": [
-            {
-                "action_type": "select_dbo_scenario",
-                "description": "Explore a specific DBO scenario",
-                "icon": "folder"
-            },
-            {
-                "action_type": "contact_expert",
-                "description": "Connect with a Siemens expert",
-                "icon": "user"
-            },
-            {
-                "action_type": "provide_information",
-                "description": "Provide additional information",
-                "icon": "info"
-            },
-            {
-                "action_type": "use_tool",
-                "description": "Use a sustainability tool",
-                "icon": "tool"
-            },
-            {
-                "action_type": "browse",
-                "description": "Browse scenarios or products",
-                "icon": "search"
-            }
-        ],
-        "supported_languages": ["en"],  # Can be extended later
-        "features": {
-            "dbo_scenarios": True,
-            "xcelerator_marketplace": True,
-            "rag_search": True,
-            "embeddings": True,
-            "chat_history": True,
-            "user_profiles": True,
-            "authentication": True,
-            "carbon_calculator": False,  # Coming soon
-            "roi_calculator": False,     # Coming soon
-            "expert_chat": True
-        },
-        "security_features": {
-            "jailbreak_protection": True,
-            "prompt_integrity": True,
-            "role_boundaries": True,
-            "audit_logging": True,
-            "data_privacy": True
-        },
-        "api_version": "3.0.0",
-        "build_date": datetime.now().strftime("%Y-%m-%d")
-    }
+    return Response(content=_SYSTEM_INFO_JSON, media_type="application/json")
 
-# Include routers
-# Authentication routes (no prefix as per standard practice)
-app.include_router(auth_router, prefix="/auth", tags=["Authentication"])
+def register_routers(app: FastAPI):
+    """Import all routers, mount them on one parent router and include it once"""
+    from app.routes.chat import router as chat_router
+    from app.routes.dbo import router as dbo_router
+    from app.routes.analytics import router as analytics_router
+    from app.routes.integration import router as integration_router
+    from app.services.auth_service import auth_router
+    
+    api_router = APIRouter()
+    
+    # Authentication routes (no prefix as per standard practice)
+    api_router.include_router(auth_router, prefix="/auth", tags=["Authentication"])
+    
+    # Chat routes at root level as per FrontEnd's specification
+    api_router.include_router(chat_router, prefix="", tags=["Chat & User Management"])
+    
+    # API versioned routes
+    api_router.include_router(dbo_router, prefix="/api/v1/dbo", tags=["DBO Scenarios"])
+    api_router.include_router(analytics_router, prefix="/api/v1/analytics", tags=["Analytics"])
+    api_router.include_router(integration_router, prefix="/api/v1/integration", tags=["Siemens Integration"])
+    
+    app.include_router(api_router)
 
-# Chat routes at root level as per FrontEnd's specification
-app.include_router(chat_router, prefix="", tags=["Chat & User Management"])
+# Routes must exist before the first request, so they are registered at import
+register_routers(app)
 
-# API versioned routes
-app.include_router(dbo_router, prefix="/api/v1/dbo", tags=["DBO Scenarios"])
-app.include_router(analytics_router, prefix="/api/v1/analytics", tags=["Analytics"])
-app.include_router(integration_router, prefix="/api/v1/integration", tags=["Siemens Integration"])
+# Static part of the startup banner, built once at import time
+STARTUP_BANNER_FOOTER = "\n".join([
+    "\n🏗️  Architecture:",
+    "   - RAG with embeddings (no LangChain)",
+    "   - Semantic search for scenarios and products",
+    "   - ReAct-style agent reasoning",
+    "   - Supabase for data persistence",
+    "   - JWT-based authentication",
+    "   - Enterprise document intelligence",
+    "   - Vector database integration (optional)",
+    "   - Real-time document monitoring",
+    "   - Multi-format document processing",
+    "\n✨ Key Features:",
+    "   ✅ Structured responses for frontend",
+    "   ✅ Chat history with GET endpoint",
+    "   ✅ User profile management",
+    "   ✅ Persona-aware responses",
+    "   ✅ Jailbreak protection",
+    "   ✅ Professional boundaries enforced",
+    "   ✅ Official document grounding",
+    "   ✅ Semantic search on Siemens documentation",
+    "   ✅ Source attribution and citation",
+    "   ✅ Anti-hallucination safeguards",
+    "   ✅ Real-time document updates",
+    "=" * 70,
+    "🎯 Ready for Siemens Enterprise Demo!",
+    "📝 API Documentation: http://localhost:8000/docs",
+    "🔍 Enterprise Stats: http://localhost:8000/enterprise/stats",
+    "=" * 70,
+])
 
-# Startup event
-@app.on_event("startup")
+# Startup (run from lifespan)
 async def startup_event():
     """Initialize services with enterprise document intelligence"""
     global rag_agent  # Make sure this is your existing global variable
     
-    logger.info("=" * 70)
     logger.info("🚀 Starting SustAInability Navigator - Enterprise RAG Version")
-    logger.info("=" * 70)
-    
-    # Check environment variables (your existing code + new ones)
-    env_vars = {
-        "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "not_set"),
-        "SUPABASE_URL": os.getenv("SUPABASE_URL", "not_set"),
-        "SUPABASE_ANON_KEY": os.getenv("SUPABASE_ANON_KEY", "not_set"),
-        "JWT_SECRET_KEY": os.getenv("JWT_SECRET_KEY", "not_set"),
-        # ADD these new environment variables
-        "PINECONE_API_KEY": os.getenv("PINECONE_API_KEY", "not_set"),
-        "PINECONE_ENVIRONMENT": os.getenv("PINECONE_ENVIRONMENT", "us-east1-gcp")
-    }
     
-    # Log configuration status (your existing code)
-    logger.info("📋 Configuration Status:")
-    for var, value in env_vars.items():
-        status = "✅" if value != "not_set" else "❌"
-        logger.info(f"   {status} {var}: {'Set' if value != 'not_set' else 'Not Set'}")
-    
-    # Log service status (your existing code - keep all of it)
-    logger.info("\n🔧 Service Status:")
-    logger.info(f"   🌱 DBO Scenarios: {len(dbo_service.scenarios) if dbo_service else 0} loaded")
-    logger.info(f"   🛒 Xcelerator Products: {len(xcelerator_service.xcelerator_catalog) if xcelerator_service else 0} available")
-    logger.info(f"   🤖 RAG Agent: {'Initialized' if rag_agent else 'Not Initialized'}")
-    logger.info(f"   📊 Embeddings: {len(getattr(rag_agent, 'dbo_embeddings', {}))} DBO, {len(getattr(rag_agent, 'product_embeddings', {}))} products")
-    logger.info(f"   🗄️  Database: {'Connected' if db_service else 'Not Connected'}")
-    logger.info(f"   🔐 Authentication: Enabled")
-    logger.info(f"   💬 Chat System: Structured responses enabled")
-    logger.info(f"   🛡️  Security: 5-cluster system active")
-    
-    # ADD new enterprise features initialization
-    logger.info("\n🚀 Initializing Enterprise Document Intelligence...")
-    
-    if rag_agent:
+    # Independent services initialize concurrently (each blocks on its own I/O)
+    base_rag_agent, dbo_service, xcelerator_service, db_service = await asyncio.gather(
+        asyncio.to_thread(get_rag_agent),
+        asyncio.to_thread(get_dbo_service),
+        asyncio.to_thread(get_xcelerator_service),
+        asyncio.to_thread(get_db_service)
+    )
+    
+    # Bind what /health reads, so it doesn't repeat getattr lookups
+    state = app.state
+    state.dbo_service = dbo_service
+    state.xcelerator_service = xcelerator_service
+    state.db_service = db_service
+    state.base_rag_agent = base_rag_agent
+    state.external_access_enabled = getattr(base_rag_agent, 'external_access_enabled', False)
+    state.strict_role_boundaries = getattr(base_rag_agent, 'strict_role_boundaries', True)
+    state.embedding_model = getattr(base_rag_agent, 'embedding_model', 'unknown')
+    state.chat_model = getattr(base_rag_agent, 'chat_model', 'unknown')
+    
+    # Snapshot everything the banner reports once, up front
+    env_vars = ("OPENAI_API_KEY", "SUPABASE_URL", "SUPABASE_ANON_KEY", "JWT_SECRET_KEY", "PINECONE_API_KEY")
+    dbo_count = len(dbo_service.scenarios) if dbo_service else 0
+    product_count = len(xcelerator_service.xcelerator_catalog) if xcelerator_service else 0
+    
+    lines = ["=" * 70, "🚀 SustAInability Navigator - Enterprise RAG Version", "=" * 70]
+    
+    # Configuration status (PINECONE_ENVIRONMENT has a default, so it is always set)
+    lines.append("📋 Configuration Status:")
+    for var in env_vars:
+        is_set = bool(os.getenv(var))
+        lines.append(f"   {'✅' if is_set else '❌'} {var}: {'Set' if is_set else 'Not Set'}")
+    lines.append("   ✅ PINECONE_ENVIRONMENT: Set")
+    
+    # Service status
+    lines.extend([
+        "\n🔧 Service Status:",
+        f"   🌱 DBO Scenarios: {dbo_count} loaded",
+        f"   🛒 Xcelerator Products: {product_count} available",
+        f"   🤖 RAG Agent: {'Initialized' if base_rag_agent else 'Not Initialized'}",
+        f"   📊 Embeddings: {'Building in background' if base_rag_agent else 'Not available'}",
+        f"   🗄️  Database: {'Connected' if db_service else 'Not Connected'}",
+        "   🔐 Authentication: Enabled",
+        "   💬 Chat System: Structured responses enabled",
+        "   🛡️  Security: 5-cluster system active",
+    ])
+    
+    if base_rag_agent:
+        # Build the embedding tables without holding up startup; chat searches
+        # wait for them, everything else is served immediately
+        base_rag_agent.start_initialization()
+        
         # Wrap your existing RAG agent with enterprise features
-        enterprise_rag = EnterpriseRAGAgent(rag_agent)
+        logger.info("🚀 Initializing Enterprise Document Intelligence...")
+        enterprise_rag = EnterpriseRAGAgent(base_rag_agent)
         await enterprise_rag.initialize_enterprise_features()
         
         # Replace the global rag_agent with the enhanced version
         rag_agent = enterprise_rag
         
-        # Log enterprise features status
-        logger.info("\n📚 Enterprise Document Intelligence:")
+        # Enterprise features status
+        lines.append("\n📚 Enterprise Document Intelligence:")
         if enterprise_rag.enterprise_initialized:
             stats = enterprise_rag.get_enterprise_stats()
             
             # Document statistics
-            if 'documents' in stats:
-                doc_stats = stats['documents']
-                logger.info(f"   📄 Documents: {doc_stats.get('total_documents', 0)} loaded")
-                logger.info(f"   📝 Chunks: {doc_stats.get('total_chunks', 0)} processed")
-                
-                # Document types
-                doc_types = doc_stats.get('documents_by_type', {})
-                for doc_type, count in doc_types.items():
-                    logger.info(f"   📋 {doc_type.title()}: {count} chunks")
+            doc_stats = stats.get('documents')
+            if doc_stats:
+                lines.append(f"   📄 Documents: {doc_stats.get('total_documents', 0)} loaded")
+                lines.append(f"   📝 Chunks: {doc_stats.get('total_chunks', 0)} processed")
+                for doc_type, count in doc_stats.get('documents_by_type', {}).items():
+                    lines.append(f"   📋 {doc_type.title()}: {count} chunks")
             
             # Vector database status
-            if 'vector_db' in stats:
-                vector_stats = stats['vector_db']
-                if 'total_vectors' in vector_stats:  # Pinecone
-                    logger.info(f"   🗄️  Vector DB: Pinecone ({vector_stats['total_vectors']} vectors)")
-                elif 'total_documents' in vector_stats:  # Chroma
-                    logger.info(f"   🗄️  Vector DB: Chroma ({vector_stats['total_documents']} documents)")
-            else:
-                logger.info(f"   🗄️  Vector DB: In-memory storage")
+            vector_stats = stats.get('vector_db')
+            if vector_stats is None:
+                lines.append("   🗄️  Vector DB: In-memory storage")
+            elif 'total_vectors' in vector_stats:  # Pinecone
+                lines.append(f"   🗄️  Vector DB: Pinecone ({vector_stats['total_vectors']} vectors)")
+            elif 'total_documents' in vector_stats:  # Chroma
+                lines.append(f"   🗄️  Vector DB: Chroma ({vector_stats['total_documents']} documents)")
             
             # Monitoring status
-            if 'monitoring' in stats:
-                monitor_stats = stats['monitoring']
-                monitored_dirs = len(monitor_stats.get('watched_directories', []))
-                logger.info(f"   👁️  Monitoring: {monitored_dirs} directories watched")
-                logger.info(f"   🔄 Mode: {monitor_stats.get('monitoring_mode', 'disabled')}")
+            monitor_stats = stats.get('monitoring')
+            if monitor_stats:
+                lines.append(f"   👁️  Monitoring: {len(monitor_stats.get('watched_directories', []))} directories watched")
+                lines.append(f"   🔄 Mode: {monitor_stats.get('monitoring_mode', 'disabled')}")
         else:
-            logger.warning("   ⚠️  Enterprise features initialization failed")
-    
-    # Log architecture info (your existing code + enhancements)
-    logger.info("\n🏗️  Architecture:")
-    logger.info("   - RAG with embeddings (no LangChain)")
-    logger.info("   - Semantic search for scenarios and products")
-    logger.info("   - ReAct-style agent reasoning")
-    logger.info("   - Supabase for data persistence")
-    logger.info("   - JWT-based authentication")
-    # ADD these new architecture features
-    logger.info("   - Enterprise document intelligence")
-    logger.info("   - Vector database integration (optional)")
-    logger.info("   - Real-time document monitoring")
-    logger.info("   - Multi-format document processing")
-    
-    # Log key features (your existing code + new features)
-    logger.info("\n✨ Key Features:")
-    logger.info("   ✅ Structured responses for frontend")
-    logger.info("   ✅ Chat history with GET endpoint")
-    logger.info("   ✅ User profile management")
-    logger.info("   ✅ Persona-aware responses")
-    logger.info("   ✅ Jailbreak protection")
-    logger.info("   ✅ Professional boundaries enforced")
-    # ADD these new enterprise features
-    logger.info("   ✅ Official document grounding")
-    logger.info("   ✅ Semantic search on Siemens documentation")
-    logger.info("   ✅ Source attribution and citation")
-    logger.info("   ✅ Anti-hallucination safeguards")
-    logger.info("   ✅ Real-time document updates")
-    
-    logger.info("=" * 70)
-    logger.info("🎯 Ready for Siemens Enterprise Demo!")
-    logger.info("📝 API Documentation: http://localhost:8000/docs")
-    logger.info("🔍 Enterprise Stats: http://localhost:8000/enterprise/stats")
-    logger.info("=" * 70)
+            lines.append("   ⚠️  Enterprise features initialization failed")
+    
+    lines.append(STARTUP_BANNER_FOOTER)
+    
+    # One log call for the whole banner (QUIET_STARTUP=1 skips it, e.g. on reloads)
+    if os.getenv("QUIET_STARTUP") != "1" and logger.isEnabledFor(logging.INFO):
+        logger.info("%s", "\n".join(lines))
 
 # ADD new enterprise endpoints
 @app.get("/enterprise/stats")
@@ -591,22 +757,12 @@ async def enterprise_health_check():
     
     return health_status
 
-# Shutdown event
-@app.on_event("shutdown")
+# Shutdown (run from lifespan)
 async def shutdown_event():
     """Cleanup on shutdown"""
+    # conversation_memory and response_cache are bounded caches now; nothing to
+    # clear, the process memory goes away with the worker
     logger.info("Shutting down SustAInability Navigator")
-    
-    # Clean up any open connections
-    if hasattr(rag_agent, 'conversation_memory'):
-        logger.info(f"Clearing {len(rag_agent.conversation_memory)} conversation memories")
-        rag_agent.conversation_memory.clear()
-    
-    # Clear response cache
-    if hasattr(rag_agent, 'response_cache'):
-        logger.info(f"Clearing {len(rag_agent.response_cache)} cached responses")
-        rag_agent.response_cache.clear()
-    
     logger.info("Shutdown complete")
 
 if __name__ == "__main__":
@@ -615,11 +771,24 @@ if __name__ == "__main__":
     # Get port from environment or default
     port = int(os.getenv("PORT", 8000))
     
-    # Run with auto-reload for development
+    # Auto-reload for development only; reload and multiple workers are mutually exclusive
+    reload = ENVIRONMENT == "development"
+    workers = 1 if reload else int(os.getenv("WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+    
+    # uvloop is a faster event loop but is not available on Windows
+    try:
+        import uvloop  # noqa: F401
+        loop = "uvloop"
+    except ImportError:
+        loop = "asyncio"
+    
     uvicorn.run(
-        "main:app",  # Use string to enable auto-reload
+        "main:app",  # Use string to enable auto-reload and workers
         host="0.0.0.0", 
         port=port,
-        reload=True if os.getenv("ENVIRONMENT", "development") == "development" else False,
+        reload=reload,
+        workers=workers,
+        loop=loop,
+        http="httptools",
         log_level="info"
     )
\ No newline at end of file
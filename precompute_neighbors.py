@@ -0,0 +1,57 @@
+"""
+Precompute the top-k DBO scenarios and Xcelerator products for the Siemens trigger
+terms so RAGAgent can answer those searches without an embedding call.
+Run offline and commit the output; rerun whenever the catalog changes.
+"""
+
+import asyncio
+
+import numpy as np
+
+from app.services.rag_agent_service import (
+    PRECOMPUTED_NEIGHBORS_PATH,
+    PRECOMPUTED_QUERY_TEMPLATES,
+    PRECOMPUTED_TOP_K,
+    SIEMENS_TERMS,
+    RAGAgent,
+    query_hash,
+)
+
+
+def main():
+    agent = RAGAgent()
+    asyncio.run(agent.initialize())
+    queries = list(dict.fromkeys(
+        template.format(term=term) for term in SIEMENS_TERMS for template in PRECOMPUTED_QUERY_TEMPLATES
+    ))
+    embeddings = agent._get_embeddings(queries)
+
+    catalogs = {
+        "dbo": (agent.dbo_ids, agent.dbo_meta, agent.dbo_index, agent.dbo_keywords),
+        "product": (agent.product_ids, agent.product_meta, agent.product_index, agent.product_keywords),
+    }
+    keys = []
+    arrays = {f"{kind}_{field}": [] for kind in catalogs for field in ("ids", "sims")}
+    for query, embedding in zip(queries, embeddings):
+        if len(embedding) == 0:
+            continue
+        keys.append(query_hash(query))
+        for kind, (ids, meta, index, keywords) in catalogs.items():
+            results = agent._semantic_search(embedding, ids, meta, index, top_k=PRECOMPUTED_TOP_K,
+                                             query=query, keyword_index=keywords)
+            padding = PRECOMPUTED_TOP_K - len(results)
+            arrays[f"{kind}_ids"].append([item_id for item_id, _, _ in results] + [""] * padding)
+            arrays[f"{kind}_sims"].append([sim for _, sim, _ in results] + [0.0] * padding)
+
+    np.savez(
+        PRECOMPUTED_NEIGHBORS_PATH,
+        keys=np.array(keys),
+        model=np.array(agent.embedding_model),
+        **{name: np.array(values, dtype=np.float32 if name.endswith("_sims") else str)
+           for name, values in arrays.items()}
+    )
+    print(f"Precomputed neighbours for {len(keys)} queries to {PRECOMPUTED_NEIGHBORS_PATH}")
+
+
+if __name__ == "__main__":
+    main()
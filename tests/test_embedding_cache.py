@@ -0,0 +1,75 @@
+# test_embedding_cache.py - Unit tests for the sqlite embedding cache and embed_with_cache
+
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.utils import embedding_cache
+from app.utils.embedding_cache import EmbeddingCache, embed_with_cache, embedding_key
+
+
+class FakeEmbeddingsClient:
+    """Minimal stand-in for openai.OpenAI: records every embeddings.create input"""
+
+    def __init__(self):
+        self.requests = []
+        self.embeddings = SimpleNamespace(create=self._create)
+
+    def _create(self, model, input):
+        self.requests.append(list(input))
+        return SimpleNamespace(data=[
+            SimpleNamespace(index=i, embedding=[float(len(text)), 1.0]) for i, text in enumerate(input)
+        ])
+
+
+def test_sqlite_round_trip(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    cache = EmbeddingCache(path)
+    key = embedding_key("text-embedding-3-small", "scope 3")
+    cache.put_many({key: [0.25, -1.5, 3.0], "empty": []})
+
+    reopened = EmbeddingCache(path)
+    vector = reopened.get(key)
+
+    assert vector.dtype == np.float32
+    np.testing.assert_array_equal(vector, [0.25, -1.5, 3.0])
+    assert reopened.get("empty") is None  # empty vectors are never stored
+    assert reopened.get_many([key, "missing"]).keys() == {key}
+    assert reopened.stats() == {'hits': 2, 'misses': 2, 'hit_rate': 0.5}
+
+
+def test_embedding_key_depends_on_model():
+    assert embedding_key("model-a", "text") != embedding_key("model-b", "text")
+
+
+def test_embed_with_cache_sends_only_distinct_misses(tmp_path, monkeypatch):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"))
+    monkeypatch.setattr(embedding_cache, "get_embedding_cache", lambda: cache)
+    client = FakeEmbeddingsClient()
+
+    first = embed_with_cache(client, "m", ["a", "bb", "a"])
+    second = embed_with_cache(client, "m", ["bb", "ccc"])
+
+    assert client.requests == [["a", "bb"], ["ccc"]]
+    np.testing.assert_array_equal(first[2], first[0])
+    np.testing.assert_array_equal(second[0], first[1])
+    np.testing.assert_array_equal(second[1], [3.0, 1.0])
+
+
+def test_embed_with_cache_survives_cache_errors(monkeypatch):
+    class BrokenCache:
+        hit_rate = 0.0
+
+        def get_many(self, keys):
+            raise embedding_cache.sqlite3.OperationalError("database is locked")
+
+        def put_many(self, vectors):
+            raise embedding_cache.sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(embedding_cache, "get_embedding_cache", lambda: BrokenCache())
+    client = FakeEmbeddingsClient()
+
+    embeddings = embed_with_cache(client, "m", ["a", "bb"], normalize=True)
+
+    assert client.requests == [["a", "bb"]]
+    np.testing.assert_allclose(np.linalg.norm(embeddings[1]), 1.0, rtol=1e-6)
@@ -0,0 +1,36 @@
+# test_keyword_search.py - Unit tests for BM25 keyword search and reciprocal rank fusion
+
+from app.utils.keyword_search import BM25Index, reciprocal_rank_fusion
+
+
+def test_rrf_prefers_rows_ranked_high_in_both_lists():
+    vector_ranking = [3, 1, 2]
+    keyword_ranking = [1, 4, 3]
+
+    fused = reciprocal_rank_fusion([vector_ranking, keyword_ranking])
+
+    assert fused[:2] == [1, 3]  # in both lists; 1 has the better worst rank
+    assert set(fused) == {1, 2, 3, 4}
+    assert fused.index(4) < fused.index(2)  # rank 2 in one list beats rank 3 in one list
+
+
+def test_rrf_single_ranking_keeps_order():
+    assert reciprocal_rank_fusion([[5, 0, 9]]) == [5, 0, 9]
+
+
+def test_rrf_empty():
+    assert reciprocal_rank_fusion([]) == []
+    assert reciprocal_rank_fusion([[], []]) == []
+
+
+def test_bm25_ranks_matching_rows_first():
+    index = BM25Index([
+        "heat pumps for commercial buildings",
+        "scope 3 emissions reporting",
+        "heat recovery and heat pumps",
+    ])
+
+    rows, scores = index.search("heat pumps", k=5)
+
+    assert list(rows) == [2, 0]  # row 1 shares no terms and is left out
+    assert scores[0] >= scores[1] > 0
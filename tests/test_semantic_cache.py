@@ -0,0 +1,84 @@
+# test_semantic_cache.py - Unit tests for the response/query SemanticCache
+
+import numpy as np
+
+from app.utils import semantic_cache
+from app.utils.semantic_cache import SemanticCache
+
+
+def _unit(*values):
+    return np.array(values, dtype=np.float32)
+
+
+def test_exact_and_similar_hits():
+    cache = SemanticCache(max_size=4, similarity_threshold=0.9)
+    cache.put("q1", _unit(1.0, 0.0), "answer")
+
+    assert cache.get("q1") == "answer"
+    assert cache.get_similar(_unit(0.99, 0.05)) == "answer"
+    assert cache.stats()["exact_hits"] == 1
+    assert cache.stats()["semantic_hits"] == 1
+
+
+def test_similarity_below_threshold_misses():
+    cache = SemanticCache(max_size=4, similarity_threshold=0.9)
+    cache.put("q1", _unit(1.0, 0.0), "answer")
+
+    assert cache.get_similar(_unit(0.7, 0.7)) is None  # cosine ~0.71
+    assert cache.get("other") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_namespaces_are_isolated():
+    cache = SemanticCache(max_size=4, similarity_threshold=0.9)
+    cache.put("q1", _unit(1.0, 0.0), "for engineers", namespace=("engineer", None))
+
+    assert cache.get_similar(_unit(1.0, 0.0), namespace=("executive", None)) is None
+    assert cache.get_similar(_unit(1.0, 0.0), namespace=("engineer", None)) == "for engineers"
+
+
+def test_lru_eviction_keeps_recently_used():
+    cache = SemanticCache(max_size=2, similarity_threshold=0.9)
+    cache.put("a", _unit(1.0, 0.0), "A")
+    cache.put("b", _unit(0.0, 1.0), "B")
+    cache.get("a")  # "b" is now least recently used
+    cache.put("c", _unit(-1.0, 0.0), "C")
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get_similar(_unit(0.0, 1.0)) is None  # evicted vector is gone too
+    assert cache.get("a") == "A"
+    assert cache.get("c") == "C"
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(semantic_cache.time, "monotonic", lambda: now[0])
+    cache = SemanticCache(max_size=4, similarity_threshold=0.9, ttl=60)
+    cache.put("a", _unit(1.0, 0.0), "A")
+    cache.put("b", _unit(0.0, 1.0), "B")
+
+    now[0] += 30
+    assert cache.get("a") == "A"
+
+    now[0] += 31
+    assert cache.get("a") is None
+    assert cache.get_similar(_unit(0.0, 1.0)) is None
+    assert cache.expire() == 0  # expired entries were already dropped on lookup
+    assert len(cache) == 0
+
+
+def test_expire_frees_slots_for_new_entries(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(semantic_cache.time, "monotonic", lambda: now[0])
+    cache = SemanticCache(max_size=2, similarity_threshold=0.9, ttl=10)
+    cache.put("a", _unit(1.0, 0.0), "A")
+    now[0] = 5.0
+    cache.put("b", _unit(0.0, 1.0), "B")
+
+    now[0] = 12.0
+    cache.put("c", _unit(-1.0, 0.0), "C")  # "a" expires instead of "b" being evicted
+
+    assert cache.get("a") is None
+    assert cache.get("b") == "B"
+    assert cache.get("c") == "C"
@@ -0,0 +1,69 @@
+# test_vector_search.py - Unit tests for the normalized-matrix cosine search
+
+import numpy as np
+import pytest
+
+from app.utils import vector_search
+from app.utils.vector_search import CosineIndex, build_normalized_matrix, top_k_indices
+
+
+@pytest.fixture
+def corpus():
+    rng = np.random.default_rng(7)
+    matrix = build_normalized_matrix(rng.normal(size=(300, 32)))
+    queries = build_normalized_matrix(rng.normal(size=(10, 32)))
+    return matrix, queries
+
+
+def test_build_normalized_matrix_unit_rows():
+    matrix = build_normalized_matrix([[3.0, 4.0], [0.0, 0.0]])
+
+    assert matrix.dtype == np.float32
+    np.testing.assert_allclose(matrix[0], [0.6, 0.8], rtol=1e-6)
+    np.testing.assert_array_equal(matrix[1], [0.0, 0.0])  # zero rows stay zero
+
+
+def test_top_k_indices_best_first():
+    similarities = np.array([0.1, 0.9, 0.5, 0.7], dtype=np.float32)
+
+    assert list(top_k_indices(similarities, 2)) == [1, 3]
+    assert list(top_k_indices(similarities, 10)) == [1, 3, 2, 0]
+    assert len(top_k_indices(similarities, 0)) == 0
+
+
+def test_matmul_path_matches_exact_scores(corpus, monkeypatch):
+    matrix, queries = corpus
+    monkeypatch.setattr(vector_search, "HNSW_MIN_ITEMS", len(matrix) + 1)
+    index = CosineIndex(matrix)
+
+    for query in queries:
+        indices, similarities = index.search(query, 5)
+        expected = np.argsort(-(matrix @ query))[:5]
+        assert list(indices) == list(expected)
+        np.testing.assert_allclose(similarities, matrix[expected] @ query, rtol=1e-5)
+
+
+@pytest.mark.skipif(not vector_search.HNSWLIB_AVAILABLE, reason="hnswlib not installed")
+def test_hnsw_matches_matmul(corpus, monkeypatch):
+    matrix, queries = corpus
+    monkeypatch.setattr(vector_search, "HNSW_MIN_ITEMS", len(matrix))
+    hnsw_index = CosineIndex(matrix)
+    monkeypatch.setattr(vector_search, "HNSW_MIN_ITEMS", len(matrix) + 1)
+    matmul_index = CosineIndex(matrix)
+    assert hnsw_index._hnsw is not None and matmul_index._hnsw is None
+
+    for query in queries:
+        hnsw_indices, hnsw_similarities = hnsw_index.search(query, 5)
+        matmul_indices, matmul_similarities = matmul_index.search(query, 5)
+        assert list(hnsw_indices) == list(matmul_indices)
+        np.testing.assert_allclose(hnsw_similarities, matmul_similarities, atol=1e-4)
+
+
+def test_search_clamps_k(corpus):
+    matrix, queries = corpus
+    index = CosineIndex(matrix[:3])
+
+    indices, similarities = index.search(queries[0], 10)
+
+    assert sorted(indices) == [0, 1, 2]
+    assert len(similarities) == 3
@@ -3,15 +3,28 @@ Pinecone vector database integration for production-scale document search
 """
 
 import asyncio
+import hashlib
 import logging
-from typing import Dict, List, Optional, Any
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any, Tuple
+import numpy as np
 from pinecone import Pinecone, ServerlessSpec
 import openai
 from datetime import datetime
 import json
+from app.utils.embedding_cache import EMBEDDING_BATCH_SIZE
 
 logger = logging.getLogger(__name__)
 
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIMENSION = 1536
+QUERY_EMBEDDING_CACHE_SIZE = 4096  # ~12 MB of float16 1536-dim vectors
+UPSERT_CONCURRENCY = 8  # upsert batches in flight at once
+SIMILARITY_THRESHOLD = 0.7  # Confidence threshold for search results
+
+# Any non-zero vector: used for filter-only queries and warmup (cosine rejects all-zero vectors)
+PROBE_VECTOR = [1.0] + [0.0] * (EMBEDDING_DIMENSION - 1)
+
 class PineconeDocumentRAG:
     """Production-ready vector database integration with Pinecone"""
 
@@ -23,6 +36,9 @@ class PineconeDocumentRAG:
         self.pc = None  # Pinecone client
         self.index = None
 
+        # LRU cache of query embeddings: (model, sha1 of normalized query) -> float16 vector
+        self._query_embedding_cache = OrderedDict()
+
     async def initialize(self):
         """Initialize Pinecone connection and index"""
 
@@ -31,13 +47,14 @@ class PineconeDocumentRAG:
             self.pc = Pinecone(api_key=self.pinecone_api_key)
 
             # Create index if it doesn't exist
-            index_list = self.pc.list_indexes()
-            if self.index_name not in index_list:
+            existing_indexes = {index.name for index in await asyncio.to_thread(self.pc.list_indexes)}
+            if self.index_name not in existing_indexes:
                 logger.info(f"Creating Pinecone index: {self.index_name}")
                 # For serverless, set cloud/region as needed (check Pinecone console for your settings!)
-                self.pc.create_index(
+                await asyncio.to_thread(
+                    self.pc.create_index,
                     name=self.index_name,
-                    dimension=1536,  # text-embedding-3-small dimension
+                    dimension=EMBEDDING_DIMENSION,  # text-embedding-3-small dimension
                     metric="cosine",
                     spec=ServerlessSpec(
                         cloud="aws",          # update if your region is different
@@ -54,86 +71,180 @@ class PineconeDocumentRAG:
             logger.error(f"Error initializing Pinecone: {e}")
             raise
 
+        # Open the Pinecone and OpenAI connections now rather than on the first user query
+        await asyncio.gather(self._warm_index(), self._warm_openai())
+
+    async def _warm_index(self):
+        try:
+            await asyncio.to_thread(self.index.query, vector=PROBE_VECTOR, top_k=1)
+        except Exception as e:
+            logger.warning(f"Pinecone warmup query failed: {e}")
+
+    async def _warm_openai(self):
+        try:
+            await asyncio.to_thread(self.openai_client.models.retrieve, EMBEDDING_MODEL)
+        except Exception as e:
+            logger.warning(f"OpenAI warmup request failed: {e}")
+
     async def add_document_chunks(self, chunks: List[Dict], batch_size: int = 100):
         """Add document chunks to Pinecone in batches"""
 
         if not self.index:
             raise RuntimeError("Pinecone not initialized")
 
-        # Prepare vectors for upsert
+        # Embed any chunks that arrive without an embedding, EMBEDDING_BATCH_SIZE per request
+        # (embeddings may be numpy arrays, so test for None rather than truthiness)
+        missing = [chunk for chunk in chunks if chunk.get('embedding') is None]
+        for start in range(0, len(missing), EMBEDDING_BATCH_SIZE):
+            batch = missing[start:start + EMBEDDING_BATCH_SIZE]
+            response = await asyncio.to_thread(
+                self.openai_client.embeddings.create,
+                model=EMBEDDING_MODEL,
+                input=[chunk['content'] for chunk in batch]
+            )
+            for item in response.data:
+                batch[item.index]['embedding'] = item.embedding
+
+        # Prepare vectors for upsert (one float32 conversion for the whole batch;
+        # embeddings may arrive as lists or as float16/float32 arrays)
+        values = np.asarray([chunk['embedding'] for chunk in chunks], dtype=np.float32).tolist()
+        created_at = datetime.now().isoformat()  # one timestamp for the whole call
         vectors = []
-        for chunk in chunks:
+        for chunk, chunk_values in zip(chunks, values):
             vector_data = {
                 'id': chunk['chunk_id'],
-                'values': chunk['embedding'],
+                'values': chunk_values,
                 'metadata': {
                     'content': chunk['content'][:40000],  # Pinecone metadata limit
                     'section_title': chunk['section_title'],
                     'source_document': chunk['source_document'],
                     'document_type': chunk['document_type'],
                     'authority': chunk['metadata'].get('authority', 'medium'),
-                    'created_at': datetime.now().isoformat(),
+                    'created_at': created_at,
                     'version': chunk['metadata'].get('version', '1.0')
                 }
             }
             vectors.append(vector_data)
 
-        # Upsert in batches
-        for i in range(0, len(vectors), batch_size):
-            batch = vectors[i:i + batch_size]
-            try:
-                self.index.upsert(vectors=batch)
-                logger.info(f"Upserted batch {i//batch_size + 1} ({len(batch)} vectors)")
-            except Exception as e:
-                logger.error(f"Error upserting batch {i//batch_size + 1}: {e}")
+        # Upsert batches concurrently (Pinecone SDK is sync, so each runs in a thread)
+        semaphore = asyncio.Semaphore(UPSERT_CONCURRENCY)
+
+        async def upsert_batch(batch_number: int, batch: List[Dict]):
+            async with semaphore:
+                await asyncio.to_thread(self.index.upsert, vectors=batch)
+            logger.info(f"Upserted batch {batch_number} ({len(batch)} vectors)")
+
+        batch_results = await asyncio.gather(*[
+            upsert_batch(i // batch_size + 1, vectors[i:i + batch_size])
+            for i in range(0, len(vectors), batch_size)
+        ], return_exceptions=True)
+
+        for batch_number, result in enumerate(batch_results, start=1):
+            if isinstance(result, Exception):
+                logger.error(f"Error upserting batch {batch_number}: {result}")
 
         logger.info(f"Successfully added {len(vectors)} chunks to Pinecone")
 
     async def semantic_search(self, query: str, top_k: int = 5, filter_dict: Dict = None) -> List[Dict]:
         """Perform semantic search using Pinecone"""
+        results = await self.semantic_search_batch([query], top_k, filter_dict)
+        return results[0] if results else []
+
+    async def semantic_search_batch(self, queries: List[str], top_k: int = 5, filter_dict: Dict = None) -> List[List[Dict]]:
+        """Embed several queries in one request and run their Pinecone searches concurrently"""
 
         if not self.index:
             raise RuntimeError("Pinecone not initialized")
 
         try:
-            # Create query embedding
-            response = self.openai_client.embeddings.create(
-                model="text-embedding-3-small",
-                input=query
+            embeddings = await self._embed_queries(queries)
+
+            # Search Pinecone for every query at once
+            return list(await asyncio.gather(*[
+                self._search_with_vector(embedding, top_k, filter_dict) for embedding in embeddings
+            ]))
+
+        except Exception as e:
+            logger.error(f"Error in Pinecone search: {e}")
+            return [[] for _ in queries]
+
+    async def _embed_queries(self, queries: List[str]) -> List[np.ndarray]:
+        """Embed queries, reusing cached vectors and sending all misses in one request"""
+        keys = [(EMBEDDING_MODEL, hashlib.sha1(query.strip().lower().encode()).hexdigest()) for query in queries]
+
+        found = {}
+        missing = {}
+        for key, query in zip(keys, queries):
+            if key in self._query_embedding_cache:
+                self._query_embedding_cache.move_to_end(key)
+                found[key] = self._query_embedding_cache[key]
+            else:
+                missing.setdefault(key, query)
+
+        if missing:
+            # OpenAI client is sync, keep it off the event loop
+            response = await asyncio.to_thread(
+                self.openai_client.embeddings.create,
+                model=EMBEDDING_MODEL,
+                input=list(missing.values())
             )
-            query_embedding = response.data[0].embedding
+            for key, item in zip(missing, sorted(response.data, key=lambda item: item.index)):
+                found[key] = np.asarray(item.embedding, dtype=np.float16)
+                self._query_embedding_cache[key] = found[key]
+                if len(self._query_embedding_cache) > QUERY_EMBEDDING_CACHE_SIZE:
+                    self._query_embedding_cache.popitem(last=False)
 
-            # Search Pinecone
-            search_results = self.index.query(
-                vector=query_embedding,
+        return [found[key] for key in keys]
+
+    async def _search_with_vector(self, query_embedding: np.ndarray, top_k: int, filter_dict: Dict = None) -> List[Dict]:
+        """Run one Pinecone query off the event loop and format the matches"""
+        try:
+            search_results = await asyncio.to_thread(
+                self.index.query,
+                vector=query_embedding.astype(np.float32).tolist(),
                 top_k=top_k,
                 include_metadata=True,
                 filter=filter_dict
             )
 
             # Format results
-            results = []
             # In Pinecone v3, search_results may be a dict, access matches via 'matches' or as .matches property
             matches = search_results.get('matches') if isinstance(search_results, dict) else getattr(search_results, "matches", [])
-            for match in matches:
-                if match['score'] > 0.7:  # Confidence threshold
-                    results.append({
-                        'chunk_id': match['id'],
-                        'content': match['metadata']['content'],
-                        'section_title': match['metadata']['section_title'],
-                        'source_document': match['metadata']['source_document'],
-                        'document_type': match['metadata']['document_type'],
-                        'authority': match['metadata']['authority'],
-                        'similarity': match['score'],
-                        'metadata': match['metadata']
-                    })
-
-            return results
+            return [
+                {
+                    'chunk_id': match['id'],
+                    'content': (metadata := match['metadata']).get('content', ''),
+                    'section_title': metadata['section_title'],
+                    'source_document': metadata['source_document'],
+                    'document_type': metadata['document_type'],
+                    'authority': metadata['authority'],
+                    'similarity': match['score'],
+                    'metadata': metadata
+                }
+                for match in matches
+                if match['score'] > SIMILARITY_THRESHOLD
+            ]
 
         except Exception as e:
             logger.error(f"Error in Pinecone search: {e}")
             return []
 
+    async def multi_filter_search(self, query: str, filter_specs: List[Tuple[Dict, int]]) -> List[List[Dict]]:
+        """Run one query under several (filter_dict, top_k) specs, embedding it only once"""
+
+        if not self.index:
+            raise RuntimeError("Pinecone not initialized")
+
+        try:
+            query_embedding = (await self._embed_queries([query]))[0]
+        except Exception as e:
+            logger.error(f"Error in Pinecone search: {e}")
+            return [[] for _ in filter_specs]
+
+        return list(await asyncio.gather(*[
+            self._search_with_vector(query_embedding, top_k, filter_dict) for filter_dict, top_k in filter_specs
+        ]))
+
     async def search_by_document_type(self, query: str, document_type: str, top_k: int = 5) -> List[Dict]:
         """Search within specific document types"""
         filter_dict = {"document_type": {"$eq": document_type}}
@@ -158,18 +269,42 @@ class PineconeDocumentRAG:
     async def delete_document(self, document_name: str):
         """Delete all chunks from a specific document"""
 
-        # Query for all chunks from this document
-        filter_dict = {"source_document": {"$eq": document_name}}
-
-        # Delete in batches (Pinecone limitation)
-        delete_batch_size = 1000
+        if not self.index:
+            raise RuntimeError("Pinecone not initialized")
 
-        # Note: This is a simplified implementation
-        # In production, you'd need to implement pagination
+        filter_dict = {"source_document": {"$eq": document_name}}
         logger.info(f"Deleting all chunks from document: {document_name}")
 
-        # For now, we'll use a namespace approach or manual tracking
-        # This would require implementing a mapping system
+        try:
+            # Pod-based indexes delete by metadata filter in a single call
+            await asyncio.to_thread(self.index.delete, filter=filter_dict)
+            return
+        except Exception as e:
+            logger.info(f"Filter delete not supported ({e}), deleting by id")
+
+        # Serverless indexes: collect the matching ids once (re-querying after a delete
+        # can return ids that are already gone), then delete them in parallel batches
+        search_results = await asyncio.to_thread(
+            self.index.query,
+            vector=PROBE_VECTOR,
+            top_k=10000,
+            include_values=False,
+            include_metadata=False,
+            filter=filter_dict
+        )
+        matches = search_results.get('matches') if isinstance(search_results, dict) else getattr(search_results, "matches", [])
+        ids = list(dict.fromkeys(match['id'] for match in matches))
+
+        semaphore = asyncio.Semaphore(4)
+
+        async def delete_batch(batch: List[str]):
+            async with semaphore:
+                await asyncio.to_thread(self.index.delete, ids=batch)
+
+        await asyncio.gather(*[delete_batch(ids[i:i + 1000]) for i in range(0, len(ids), 1000)])
+        deleted = len(ids)
+
+        logger.info(f"Deleted {deleted} chunks from document: {document_name}")
 
     def get_index_stats(self) -> Dict:
         """Get statistics about the Pinecone index"""